@@ -1,5 +1,8 @@
 ﻿import asyncio
+import multiprocessing
 from irc_bot.bot import main
 
 if __name__ == "__main__":
+    # Needed by the frozen exe when networks are sharded across processes
+    multiprocessing.freeze_support()
     asyncio.run(main())
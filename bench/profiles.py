@@ -0,0 +1,157 @@
+"""Measure profile store load time and memory at several store sizes.
+
+Generates synthetic profiles, writes them both as the JSON file the bot has
+always used and as a binary snapshot, then loads each in a fresh process:
+
+    json-dict  json.loads into plain dicts (how ProfileStore held them before)
+    records    ProfileStore on the JSON file (slot records, interned values)
+    snapshot   ProfileStore on the snapshot (mapped, decoded per lookup)
+
+Load time covers opening the file through the first lookup. RSS is the
+growth of resident memory across the load, so interpreter startup is not
+counted; the snapshot's figure includes the pages its lookups touched.
+
+    python bench/profiles.py
+    python bench/profiles.py --sizes 10000,100000 --lookups 1000
+
+Files are written to a temporary directory and removed afterwards.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+MODES = ("json-dict", "records", "snapshot")
+
+LOCATIONS = [f"City{i}" for i in range(300)]
+GENDERS = ["female", "male", "nonbinary", "other"]
+POSITIONS = ["top", "bottom", "switch", "none"]
+ORIENTATIONS = ["straight", "gay", "bi", "pan", "ace"]
+SEEKING = ["chat", "friends", "dating", "rp"]
+
+
+def _rss_bytes() -> int:
+    """Current resident set size, or 0 where it cannot be read."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if os.name == "nt":
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t)
+                for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage",
+                )
+            ]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+    return 0
+
+
+def _generate(n: int, seed: int = 1) -> dict:
+    rnd = random.Random(seed)
+    data = {}
+    for i in range(n):
+        prof = {"age": rnd.randint(18, 70), "location": rnd.choice(LOCATIONS), "gender": rnd.choice(GENDERS)}
+        if rnd.random() < 0.6:
+            prof["orientation"] = rnd.choice(ORIENTATIONS)
+            prof["position"] = rnd.choice(POSITIONS)
+        if rnd.random() < 0.5:
+            prof["seeking"] = rnd.choice(SEEKING)
+        if rnd.random() < 0.4:
+            prof["bio"] = f"Hello, I am user {i} and I like {rnd.choice(SEEKING)}."
+        key = f"$a:net:user{i}" if i % 2 else f"nick{i}"
+        data[key] = prof
+    return data
+
+
+def _child(mode: str, path: str, lookups: int, keys_path: str) -> None:
+    from irc_bot.profiles import ProfileStore
+
+    keys = json.loads(Path(keys_path).read_text(encoding="utf-8"))[:lookups]
+    before = _rss_bytes()
+    start = time.perf_counter()
+    if mode == "json-dict":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        data.get(keys[0])
+        loaded = time.perf_counter()
+        lookup_start = time.perf_counter()
+        for key in keys:
+            data.get(key)
+    else:
+        store = ProfileStore(path, fmt="binary" if mode == "snapshot" else "json")
+        store.get_profile(keys[0])
+        loaded = time.perf_counter()
+        lookup_start = time.perf_counter()
+        for key in keys:
+            store.get_profile(key)
+    lookup_us = (time.perf_counter() - lookup_start) / len(keys) * 1e6
+    rss = _rss_bytes() - before
+    print(json.dumps({"load_ms": (loaded - start) * 1000.0, "rss_mb": rss / 2**20, "lookup_us": lookup_us}))
+
+
+def _run_child(mode: str, path: Path, lookups: int, keys_path: Path) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", mode, str(path), "--lookups", str(lookups), "--keys", str(keys_path)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(out)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated profile counts")
+    parser.add_argument("--lookups", type=int, default=1000, help="random lookups after loading")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    parser.add_argument("--keys", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child[0], args.child[1], args.lookups, args.keys)
+        return 0
+
+    from irc_bot.profile_snapshot import write_snapshot
+    from irc_bot.profiles import ProfileRecord
+
+    print(f"{'profiles':>9} {'mode':<10} {'file MB':>8} {'load ms':>9} {'RSS MB':>8} {'lookup us':>10}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        data = _generate(n)
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = Path(tmp, "profiles.json")
+            json_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+            bin_path = Path(tmp, "profiles.bin")
+            write_snapshot(bin_path, {k: ProfileRecord.from_dict(v) for k, v in data.items()})
+            keys_path = Path(tmp, "keys.json")
+            keys_path.write_text(json.dumps(random.Random(2).sample(list(data), min(n, args.lookups))))
+            del data
+
+            for mode in MODES:
+                path = bin_path if mode == "snapshot" else json_path
+                r = _run_child(mode, path, args.lookups, keys_path)
+                size = path.stat().st_size / 2**20
+                print(f"{n:>9} {mode:<10} {size:>8.1f} {r['load_ms']:>9.1f} {r['rss_mb']:>8.1f} {r['lookup_us']:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Measure bot startup: process start -> registration (USER) received by the server.
+
+Runs the bot against a local fake IRC server several times and reports the
+median and minimum. By default it runs from source (`python -m irc_bot.bot`);
+pass `--exe dist/AscensionismBot.exe` to time the frozen build instead.
+
+    python bench/startup.py
+    python bench/startup.py --exe dist/AscensionismBot.exe --runs 5
+    python bench/startup.py --budget-ms 300   # exit 1 if the median is slower
+
+Prints one line per run and a summary; nothing is written to the repo.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+async def _time_once(cmd: list, cwd: str, env: dict, timeout: float) -> float:
+    registered = asyncio.get_running_loop().create_future()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.startswith(b"USER ") and not registered.done():
+                registered.set_result(time.perf_counter())
+                break
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    cfg = {
+        "server": "127.0.0.1",
+        "port": port,
+        "tls": False,
+        "nickname": "benchbot",
+        "username": "bench",
+        "realname": "bench",
+        "channels": [],
+    }
+    Path(cwd, "config.json").write_text(json.dumps(cfg), encoding="utf-8")
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        done = await asyncio.wait_for(registered, timeout)
+    finally:
+        proc.kill()
+        proc.wait()
+        server.close()
+        await server.wait_closed()
+    return (done - start) * 1000.0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--exe", help="frozen executable to time instead of the source tree")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for registration per run")
+    parser.add_argument("--budget-ms", type=float, help="fail if the median exceeds this many milliseconds")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.exe:
+        cmd = [str(Path(args.exe).resolve())]
+        label = "frozen"
+    else:
+        cmd = [sys.executable, "-m", "irc_bot.bot"]
+        env["PYTHONPATH"] = str(ROOT) + os.pathsep + env.get("PYTHONPATH", "")
+        label = "source"
+
+    samples = []
+    with tempfile.TemporaryDirectory() as cwd:
+        for i in range(args.runs):
+            ms = asyncio.run(_time_once(cmd, cwd, env, args.timeout))
+            samples.append(ms)
+            print(f"{label} run {i + 1}: {ms:.1f} ms")
+
+    median = statistics.median(samples)
+    print(f"{label}: median {median:.1f} ms, min {min(samples):.1f} ms over {len(samples)} runs")
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f"over budget: {median:.1f} ms > {args.budget_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -25,13 +25,22 @@ $exeName = "AscensionismBot"
 $entry = "_pyi_entry.py"
 @"
 import asyncio
+import multiprocessing
 from irc_bot.bot import main
 
 if __name__ == "__main__":
+    # Needed by the frozen exe when networks are sharded across processes
+    multiprocessing.freeze_support()
     asyncio.run(main())
 "@ | Set-Content -Path $entry -Encoding UTF8
 
-python -m PyInstaller --onefile --name $exeName $entry
+# Command modules are imported lazily by name, so PyInstaller cannot see them: collect them explicitly.
+# Skipping UPX and unused stdlib GUI/test modules keeps the onefile archive small and quick to unpack.
+python -m PyInstaller --onefile --name $exeName `
+    --collect-submodules irc_bot.commands `
+    --noupx `
+    --exclude-module tkinter --exclude-module unittest --exclude-module pydoc --exclude-module doctest `
+    $entry
 
 Write-Host "Build complete. See dist/$exeName.exe"
 
@@ -1,23 +1,28 @@
 import asyncio
-from typing import Dict, Callable
+from typing import Any, Dict, List, Optional
 
-# Robust imports: support running as a package or as a script (PyInstaller direct)
-try:
-    from .config import load_config
-    from .irc_client import IRCClient
-except Exception:
-    try:
-        from irc_bot.config import load_config
-        from irc_bot.irc_client import IRCClient
-    except Exception:
-        from config import load_config
-        from irc_client import IRCClient
+from .commands import CommandRegistry
+from .config import load_networks
+from .irc_client import IRCClient, irc_lower
+from .profiles import ProfileStore
+from .seen import SeenTracker
+from .scrollback import Scrollback
+
+
+# Numerics that mean a PRIVMSG target rejected a message
+SEND_ERROR_NUMERICS = {"401", "403", "404", "442"}
 
 
 class Bot:
-    def __init__(self, cfg: Dict):
+    def __init__(self, cfg: Dict, profile_store: Optional[ProfileStore] = None):
         self.cfg = cfg
         self.prefix = cfg.get("command_prefix", "!")
+        # Network name; set when running several networks from one config
+        self.network: Optional[str] = cfg.get("name")
+        # Profiles may be shared by several Bots; account keys are namespaced per network
+        self.profiles = profile_store if profile_store is not None else open_profiles(cfg)
+        # This network also reads, and takes over, profiles saved before it had a name
+        self.legacy_profiles = bool(self.network) and cfg.get("legacy_profiles", False)
         self.client = IRCClient(
             server=cfg["server"],
             port=cfg["port"],
@@ -34,23 +39,98 @@ class Bot:
             nickserv_username=cfg.get("nickserv_username") or None,
             nickserv_password=cfg.get("nickserv_password") or None,
             debug=cfg.get("debug", False),
+            who_interval=cfg.get("who_sync_interval", 1.0),
+            flood_burst=cfg.get("flood_burst", 5),
+            flood_interval=cfg.get("flood_interval", 2.0),
         )
 
-        self.commands: Dict[str, Callable[[str, str, list[str]], None]] = {
-            "ping": self.cmd_ping,
-            "hello": self.cmd_hello,
-            "help": self.cmd_help,
-            "profile": self.cmd_profile,
-            "view": self.cmd_view,
-            "say": self.cmd_say,
-        }
+        # Handlers live in irc_bot.commands and are imported on first use
+        self.commands = CommandRegistry()
+
+        self.seen = SeenTracker(
+            path=cfg.get("seen_path", "seen.json"),
+            flush_interval=cfg.get("seen_flush_interval", 60),
+        )
+        self._seen_task = None
+        self._profiles_warmed = False
+
+        self.scrollback = Scrollback(
+            capacity=cfg.get("scrollback_lines", 500),
+            spill_dir=cfg.get("scrollback_spill_dir") or None,
+            segment_bytes=cfg.get("scrollback_segment_bytes", 1 << 20),
+            max_segments=cfg.get("scrollback_segments", 4),
+        )
+
+        # Send errors collected for each !say broadcast in flight
+        self._broadcast_errors: List[Dict[str, str]] = []
+        self.broadcast_error_grace = 2.0
+        # Longest a command waits for a channel's WHO sync before checking modes
+        self.sync_wait = 5.0
 
         # Wire callbacks
         self.client.on_welcome = self.on_welcome
         self.client.on_privmsg = self.on_privmsg
+        self.client.on_message = self.on_message
 
     def on_welcome(self) -> None:
-        print("Connected. Joining channels...")
+        print(f"{self._log_prefix()}Connected. Joining channels...")
+        if self._seen_task is None:
+            self._seen_task = asyncio.create_task(self.seen.flush_loop())
+            # Read saved !seen state off the event loop; messages meanwhile are kept in memory
+            load = asyncio.get_running_loop().run_in_executor(None, self.seen.load)
+            load.add_done_callback(self._seen_loaded)
+        if not self._profiles_warmed:
+            self._profiles_warmed = True
+            # Load profiles in the background so the first !profile/!view does not pay for it
+            warm = asyncio.get_running_loop().run_in_executor(None, self.profiles.reload)
+            warm.add_done_callback(self._profiles_loaded)
+
+    def _profiles_loaded(self, future: "asyncio.Future[None]") -> None:
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            # Commands still load the store on demand; report why warming failed
+            print(f"{self._log_prefix()}Could not load profiles from {self.profiles.path}: {exc!r}")
+
+    def _seen_loaded(self, future: "asyncio.Future[SeenTracker]") -> None:
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            # !seen still loads on demand; report why the background load failed
+            print(f"{self._log_prefix()}Could not load seen data from {self.seen.path}: {exc!r}")
+            return
+        self.seen.install(future.result())
+
+    def _log_prefix(self) -> str:
+        return f"[{self.network}] " if self.network else ""
+
+    @staticmethod
+    def reply_target(target: str, nick: str) -> str:
+        """Where to answer a command: its channel, or the sender for a DM."""
+        return target if target.startswith("#") else nick
+
+    async def wait_synced(self, channels: List[str]) -> None:
+        """Wait for pending WHO syncs of `channels` so mode checks see current roles."""
+        pending = [ch for ch in channels if self.client.sync_pending(ch)]
+        if pending:
+            await asyncio.gather(*(self.client.wait_synced(ch, self.sync_wait) for ch in pending))
+
+    def _account_key(self, account: str) -> str:
+        return ProfileStore.account_key(account, self.network)
+
+    def _nick_key(self, nick: str) -> str:
+        return ProfileStore.nick_key(nick, self.network)
+
+    def on_message(self, msg: Dict[str, Any]) -> None:
+        self.seen.handle_message(msg)
+        self.scrollback.handle_message(msg)
+        if self._broadcast_errors and msg["command"] in SEND_ERROR_NUMERICS:
+            params = msg.get("params") or []
+            if len(params) > 1:
+                for errors in self._broadcast_errors:
+                    errors[irc_lower(params[1])] = msg.get("trailing") or msg["command"]
 
     def on_privmsg(self, nick: str, target: str, text: str) -> None:
         # Only respond to commands
@@ -67,167 +147,79 @@ class Bot:
             # Unknown command: show minimal help
             asyncio.create_task(self.client.send_privmsg(target, f"Unknown command '{name}'. Try {self.prefix}help"))
             return
-        handler(target, nick, args)
-
-    # Commands
-    def cmd_ping(self, target: str, nick: str, args: list[str]) -> None:
-        asyncio.create_task(self.client.send_privmsg(target, "Pong!"))
-
-    def cmd_hello(self, target: str, nick: str, args: list[str]) -> None:
-        asyncio.create_task(self.client.send_privmsg(target, f"Hello, {nick}!"))
-
-    def cmd_help(self, target: str, nick: str, args: list[str]) -> None:
-        names = ", ".join(sorted(self.commands.keys()))
-        asyncio.create_task(self.client.send_privmsg(target, f"Commands: {names}"))
-
-    # Profile command
-    def cmd_profile(self, target: str, nick: str, args: list[str]) -> None:
-        from .profiles import ProfileStore
-        store = getattr(self, "_profile_store", None)
-        if store is None:
-            store = ProfileStore()
-            self._profile_store = store
-
-        async def send(msg: str) -> None:
-            await self.client.send_privmsg(target, msg)
-
-        if not args or args[0].lower() in {"help", "?"}:
-            usage = (
-                "Usage: !profile set key=value ... | !profile get | !profile clear | !profile help"
-            )
-            fields = "Fields: age, location, interests, bio"
-            asyncio.create_task(send(usage))
-            asyncio.create_task(send(fields))
-            return
+        handler(self, target, nick, args)
 
-        sub = args[0].lower()
-        if sub == "get":
-            prof = store.get_profile(nick)
-            if not prof:
-                asyncio.create_task(send("No profile found. Use !profile set key=value"))
-                return
-            parts = [f"{k}={v}" for k, v in prof.items()]
-            asyncio.create_task(send("Profile: " + ", ".join(parts)))
-            return
-        if sub == "clear" or sub == "delete":
-            store.clear_profile(nick)
-            asyncio.create_task(send("Profile cleared."))
-            return
-        if sub == "set":
-            updates = store.parse_updates(args[1:])
-            if not updates:
-                asyncio.create_task(send("Provide fields as key=value (e.g., age=25 location=NY interests=gaming bio=Hi)"))
-                return
-            prof = store.update_profile(nick, updates)
-            parts = [f"{k}={v}" for k, v in prof.items()]
-            asyncio.create_task(send("Profile updated: " + ", ".join(parts)))
-            return
 
-        asyncio.create_task(send("Unknown subcommand. Try !profile help"))
+def open_profiles(cfg: Dict) -> ProfileStore:
+    return ProfileStore(cfg.get("profiles_path", "profiles.json"), fmt=cfg.get("profiles_format", "json"))
 
-    # View another user's profile
-    def cmd_view(self, target: str, nick: str, args: list[str]) -> None:
-        from .profiles import ProfileStore
-        store = getattr(self, "_profile_store", None)
-        if store is None:
-            store = ProfileStore()
-            self._profile_store = store
 
-        async def send(msg: str) -> None:
-            await self.client.send_privmsg(target, msg)
+async def run_bot(bot: Bot) -> None:
+    await bot.client.connect()
+    try:
+        await bot.client.run()
+    finally:
+        bot.seen.flush()
+        bot.scrollback.close()
+        await bot.client.close()
 
-        if not args:
-            asyncio.create_task(send("Usage: !view <nick>"))
-            return
-        other = args[0]
-        prof = store.get_profile(other)
-        if not prof:
-            asyncio.create_task(send(f"No profile found for {other}."))
-            return
-        parts = [f"{k}={v}" for k, v in prof.items()]
-        # Keep message reasonably short; split if necessary
-        msg = f"Profile for {other}: " + ", ".join(parts)
-        if len(msg) > 400:
-            # Split into chunks
-            chunks = []
-            cur = ""
-            for p in parts:
-                if len(cur) + len(p) + 2 > 380:
-                    chunks.append(cur)
-                    cur = p
-                else:
-                    cur = p if not cur else (cur + ", " + p)
-            if cur:
-                chunks.append(cur)
-            asyncio.create_task(send(f"Profile for {other}:"))
-            for c in chunks:
-                asyncio.create_task(send(c))
-        else:
-            asyncio.create_task(send(msg))
-
-    # DM-based say: user DMs the bot, bot speaks in configured channel
-    def cmd_say(self, target: str, nick: str, args: list[str]) -> None:
-        async def reply(msg: str) -> None:
-            await self.client.send_privmsg(target, msg)
-
-        # Require DM to the bot (target is bot's nick), not a channel
-        if target.startswith("#"):
-            asyncio.create_task(reply("Please DM the bot: !say <message>"))
-            return
 
-        channel = self.cfg.get("say_channel")
-        if not channel:
-            asyncio.create_task(reply("No say channel configured. Set `say_channel` in config.json."))
-            return
+async def run_networks(cfgs: List[Dict], profile_store: Optional[ProfileStore] = None) -> None:
+    """Run one Bot per network config on the current event loop.
 
-        if not args:
-            asyncio.create_task(reply("Usage: !say <message>"))
-            return
+    All Bots share one ProfileStore. A network whose connection fails is
+    reported and the others keep running; the error is raised only when
+    every network has failed.
+    """
+    # Profiles are shared by every network, so the first config's settings apply
+    store = profile_store if profile_store is not None else open_profiles(cfgs[0])
+    bots = [Bot(cfg, profile_store=store) for cfg in cfgs]
+    results = await asyncio.gather(*(run_bot(b) for b in bots), return_exceptions=True)
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if len(bots) > 1:
+        for bot, result in zip(bots, results):
+            if isinstance(result, BaseException):
+                print(f"{bot._log_prefix()}Disconnected: {result!r}")
+    if errors and len(errors) == len(bots):
+        raise errors[0]
 
-        text = " ".join(args).strip()
-        if not text:
-            asyncio.create_task(reply("Usage: !say <message>"))
-            return
 
-        # Permissions: require op in target channel unless disabled; or admin
-        is_admin = nick in self.cfg.get("admins", [])
-        require_op = self.cfg.get("say_require_op", True)
-        is_op = True
-        if require_op:
-            is_op = self.client.is_op_or_above(channel, nick)
-        if not (is_admin or is_op):
-            asyncio.create_task(reply("Insufficient permissions. You must be a channel operator or listed admin."))
-            return
+def shard_networks(cfgs: List[Dict], processes: int) -> List[List[Dict]]:
+    """Split network configs round-robin into at most `processes` groups."""
+    shards: List[List[Dict]] = [[] for _ in range(min(processes, len(cfgs)))]
+    for i, cfg in enumerate(cfgs):
+        shards[i % len(shards)].append(cfg)
+    return shards
 
-        # Send to the configured channel; chunk long messages
-        async def send_to_channel(msg: str) -> None:
-            await self.client.send_privmsg(channel, msg)
-
-        if len(text) > 400:
-            chunks = []
-            cur = ""
-            for word in text.split():
-                if len(cur) + len(word) + 1 > 380:
-                    chunks.append(cur)
-                    cur = word
-                else:
-                    cur = word if not cur else (cur + " " + word)
-            if cur:
-                chunks.append(cur)
-            for c in chunks:
-                asyncio.create_task(send_to_channel(c))
-        else:
-            asyncio.create_task(send_to_channel(text))
 
+def _run_shard(cfgs: List[Dict]) -> None:
+    asyncio.run(run_networks(cfgs))
 
-async def main() -> None:
-    cfg = load_config()
-    bot = Bot(cfg)
-    await bot.client.connect()
+
+async def run_sharded(cfgs: List[Dict], processes: int) -> None:
+    """Run networks across worker processes, each with its own event loop."""
+    import multiprocessing
+
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_run_shard, args=(shard,)) for shard in shard_networks(cfgs, processes)]
+    for p in procs:
+        p.start()
+    loop = asyncio.get_running_loop()
     try:
-        await bot.client.run()
+        await asyncio.gather(*(loop.run_in_executor(None, p.join) for p in procs))
     finally:
-        await bot.client.close()
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+
+
+async def main() -> None:
+    cfgs = load_networks()
+    processes = cfgs[0].get("processes", 1)
+    if processes > 1 and len(cfgs) > 1:
+        await run_sharded(cfgs, processes)
+    else:
+        await run_networks(cfgs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+import asyncio
+import functools
+import importlib
+from typing import Callable, Dict, List, Optional
+
+# Command name -> "module:function". Handlers are called as handler(bot, target, nick, args).
+# Only this table is read at startup; a command module is imported the first
+# time one of its commands is used.
+MANIFEST: Dict[str, str] = {
+    "ping": "irc_bot.commands.basic:cmd_ping",
+    "hello": "irc_bot.commands.basic:cmd_hello",
+    "help": "irc_bot.commands.basic:cmd_help",
+    "profile": "irc_bot.commands.profile:cmd_profile",
+    "view": "irc_bot.commands.profile:cmd_view",
+    "say": "irc_bot.commands.say:cmd_say",
+    "seen": "irc_bot.commands.history:cmd_seen",
+    "grep": "irc_bot.commands.history:cmd_grep",
+    "last": "irc_bot.commands.history:cmd_last",
+}
+
+Handler = Callable[..., None]
+
+
+def _unavailable(name: str, error: Exception, bot, target: str, nick: str, args: List[str]) -> None:
+    # Stands in for a command whose handler could not be imported, e.g. a
+    # module left out of a frozen build
+    print(f"{bot._log_prefix()}Command '{name}' is unavailable: {error!r}")
+    asyncio.create_task(bot.client.send_privmsg(bot.reply_target(target, nick), f"Command '{name}' is unavailable."))
+
+
+class CommandRegistry:
+    """Command lookup backed by a manifest of lazily imported handlers."""
+
+    def __init__(self, manifest: Optional[Dict[str, str]] = None) -> None:
+        self._manifest: Dict[str, str] = dict(MANIFEST if manifest is None else manifest)
+        self._handlers: Dict[str, Handler] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._manifest or name in self._handlers
+
+    def names(self) -> List[str]:
+        return sorted(set(self._manifest) | set(self._handlers))
+
+    def register(self, name: str, target) -> None:
+        """Add a command from a "module:function" string or a callable."""
+        if callable(target):
+            self._handlers[name] = target
+            self._manifest.pop(name, None)
+        else:
+            self._manifest[name] = target
+            self._handlers.pop(name, None)
+
+    def get(self, name: str) -> Optional[Handler]:
+        """The handler for `name`, or None if there is no such command.
+
+        A handler that fails to import is not cached: a stand-in that logs
+        the error and replies that the command is unavailable is returned,
+        and the import is tried again on the next use.
+        """
+        handler = self._handlers.get(name)
+        if handler is not None:
+            return handler
+        spec = self._manifest.get(name)
+        if spec is None:
+            return None
+        module_name, _, func_name = spec.partition(":")
+        try:
+            handler = getattr(importlib.import_module(module_name), func_name)
+        except (ImportError, AttributeError) as exc:
+            return functools.partial(_unavailable, name, exc)
+        self._handlers[name] = handler
+        return handler
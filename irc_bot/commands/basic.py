@@ -0,0 +1,14 @@
+import asyncio
+
+
+def cmd_ping(bot, target: str, nick: str, args: list[str]) -> None:
+    asyncio.create_task(bot.client.send_privmsg(target, "Pong!"))
+
+
+def cmd_hello(bot, target: str, nick: str, args: list[str]) -> None:
+    asyncio.create_task(bot.client.send_privmsg(target, f"Hello, {nick}!"))
+
+
+def cmd_help(bot, target: str, nick: str, args: list[str]) -> None:
+    names = ", ".join(bot.commands.names())
+    asyncio.create_task(bot.client.send_privmsg(target, f"Commands: {names}"))
@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+from ..irc_client import irc_lower
+from ..seen import format_ago, KIND_PRIVMSG, KIND_JOIN, KIND_PART, KIND_QUIT, KIND_NICK_TO
+
+# Lines returned by !grep / !last
+SCROLLBACK_RESULTS = 3
+
+
+def _shares_channel(bot, target: str, nick: str, channel: str) -> bool:
+    """True if `nick` asked in `channel` or is currently in it."""
+    if irc_lower(target) == irc_lower(channel):
+        return True
+    user = bot.client.users.get(nick)
+    return user is not None and irc_lower(channel) in user.channels
+
+
+# Last activity of a nick
+def cmd_seen(bot, target: str, nick: str, args: list[str]) -> None:
+    reply_to = bot.reply_target(target, nick)
+
+    async def send(msg: str) -> None:
+        await bot.client.send_privmsg(reply_to, msg)
+
+    if not args:
+        asyncio.create_task(send("Usage: !seen <nick>"))
+        return
+    other = args[0]
+    info = bot.seen.last_seen(other)
+    if not info:
+        asyncio.create_task(send(f"I haven't seen {other}."))
+        return
+    ago = format_ago(int(time.time()) - info["ts"])
+    who = info["nick"]
+    # Where and what was said stay within the channel: secret and private
+    # channels are not revealed to someone outside them
+    if info["channel"] and not _shares_channel(bot, target, nick, info["channel"]):
+        asyncio.create_task(send(f"{who} was last seen {ago} ago."))
+        return
+    where = f" in {info['channel']}" if info["channel"] else ""
+    kind = info["kind"]
+    if kind == KIND_PRIVMSG:
+        what = f"saying: {info['text']}"
+    elif kind == KIND_JOIN:
+        what = "joining"
+    elif kind == KIND_PART:
+        what = "leaving" + (f" ({info['text']})" if info["text"] else "")
+    elif kind == KIND_QUIT:
+        what = "quitting" + (f" ({info['text']})" if info["text"] else "")
+    elif kind == KIND_NICK_TO:
+        what = f"changing nick to {info['text']}"
+    else:
+        what = f"changing nick from {info['text']}"
+    asyncio.create_task(send(f"{who} was last seen {ago} ago{where}, {what}"))
+
+
+# Scrollback search: in a channel searches that channel; in DM takes a channel first
+def _scrollback_target(bot, target: str, nick: str, args: list[str], usage: str):
+    if target.startswith("#"):
+        channel = target
+    elif args and args[0].startswith("#"):
+        channel, args = args[0], args[1:]
+    else:
+        channel = None
+    if channel is None or not args:
+        asyncio.create_task(bot.client.send_privmsg(bot.reply_target(target, nick), f"Usage: {usage}"))
+        return None, None
+    return channel, args
+
+
+async def _send_scrollback(bot, reply_to: str, nick: str, channel: str, lookup, empty: str) -> None:
+    """Check the caller may read `channel`, then send the lines `lookup()` returns."""
+    if nick not in bot.cfg.get("admins", []):
+        # Op status may still be arriving from the channel's WHO sync
+        await bot.wait_synced([channel])
+        if not bot.client.is_op_or_above(channel, nick):
+            msg = "Insufficient permissions. You must be a channel operator or listed admin."
+            await bot.client.send_privmsg(reply_to, msg)
+            return
+    lines = lookup()
+    if not lines:
+        await bot.client.send_privmsg(reply_to, empty)
+        return
+    for ts, who, text in lines:
+        stamp = time.strftime("%m-%d %H:%M", time.localtime(ts))
+        await bot.client.send_privmsg(reply_to, f"[{channel} {stamp}] <{who}> {text}")
+
+
+def cmd_grep(bot, target: str, nick: str, args: list[str]) -> None:
+    channel, args = _scrollback_target(bot, target, nick, args, "!grep [#channel] <words>")
+    if channel is None:
+        return
+    pattern = " ".join(args)
+    asyncio.create_task(_send_scrollback(
+        bot, bot.reply_target(target, nick), nick, channel,
+        lambda: bot.scrollback.search(channel, pattern, limit=SCROLLBACK_RESULTS),
+        f"No matches for '{pattern}' in {channel}.",
+    ))
+
+
+def cmd_last(bot, target: str, nick: str, args: list[str]) -> None:
+    channel, args = _scrollback_target(bot, target, nick, args, "!last [#channel] <nick>")
+    if channel is None:
+        return
+    other = args[0]
+    asyncio.create_task(_send_scrollback(
+        bot, bot.reply_target(target, nick), nick, channel,
+        lambda: bot.scrollback.last(channel, other, limit=SCROLLBACK_RESULTS),
+        f"No recent lines from {other} in {channel}.",
+    ))
@@ -0,0 +1,133 @@
+import asyncio
+
+from ..irc_client import irc_lower
+from ..profiles import ProfileFileError, ProfileStore
+
+
+# Profile command
+def cmd_profile(bot, target: str, nick: str, args: list[str]) -> None:
+    try:
+        _profile(bot, target, nick, args)
+    except ProfileFileError as exc:
+        # Never save over a file that failed to load; tell the user and the log
+        print(f"{bot._log_prefix()}{exc}")
+        msg = "Profiles cannot be changed right now: the profile file could not be read."
+        asyncio.create_task(bot.client.send_privmsg(target, msg))
+
+
+def _profile(bot, target: str, nick: str, args: list[str]) -> None:
+    store = bot.profiles
+
+    async def send(msg: str) -> None:
+        await bot.client.send_privmsg(target, msg)
+
+    # Identified users are keyed by account so the profile follows nick changes
+    nick_key = key = bot._nick_key(nick)
+    account = bot.client.users.account(nick)
+    if bot.legacy_profiles:
+        # Saved before this network had a name: move under its name on first use
+        store.migrate(nick, nick_key)
+        if account:
+            store.migrate(ProfileStore.account_key(account), bot._account_key(account))
+    if account:
+        key = bot._account_key(account)
+        # A profile saved under the nick before accounts were tracked moves to
+        # the account by itself only when they match; otherwise "!profile claim"
+        if irc_lower(account) == irc_lower(nick):
+            store.migrate(nick_key, key)
+
+    if not args or args[0].lower() in {"help", "?"}:
+        usage = (
+            "Usage: !profile set key=value ... | !profile get | !profile clear | !profile claim | !profile help"
+        )
+        fields = "Fields: age, location, interests, bio"
+        asyncio.create_task(send(usage))
+        asyncio.create_task(send(fields))
+        return
+
+    if not account and bot.cfg.get("profile_require_account", False):
+        asyncio.create_task(send("You must be identified with services to use profiles."))
+        return
+
+    sub = args[0].lower()
+    if sub == "get":
+        prof = store.get_profile(key)
+        if not prof:
+            asyncio.create_task(send("No profile found. Use !profile set key=value"))
+            return
+        parts = [f"{k}={v}" for k, v in prof.items()]
+        asyncio.create_task(send("Profile: " + ", ".join(parts)))
+        return
+    if sub == "clear" or sub == "delete":
+        store.clear_profile(key)
+        asyncio.create_task(send("Profile cleared."))
+        return
+    if sub == "claim":
+        # Move the profile saved under your current nick to your account
+        if not account:
+            asyncio.create_task(send("You must be identified with services to claim a profile."))
+        elif store.migrate(nick_key, key):
+            asyncio.create_task(send(f"Profile saved under {nick} moved to your account."))
+        else:
+            asyncio.create_task(send("Nothing to claim: no profile under this nick, or your account already has one."))
+        return
+    if sub == "set":
+        updates = store.parse_updates(args[1:])
+        if not updates:
+            asyncio.create_task(send("Provide fields as key=value (e.g., age=25 location=NY interests=gaming bio=Hi)"))
+            return
+        prof = store.update_profile(key, updates)
+        parts = [f"{k}={v}" for k, v in prof.items()]
+        asyncio.create_task(send("Profile updated: " + ", ".join(parts)))
+        return
+
+    asyncio.create_task(send("Unknown subcommand. Try !profile help"))
+
+
+# View another user's profile
+def cmd_view(bot, target: str, nick: str, args: list[str]) -> None:
+    store = bot.profiles
+
+    async def send(msg: str) -> None:
+        await bot.client.send_privmsg(target, msg)
+
+    if not args:
+        asyncio.create_task(send("Usage: !view <nick>"))
+        return
+    other = args[0]
+    prof = None
+    account = bot.client.users.account(other)
+    if account:
+        prof = store.get_profile(bot._account_key(account))
+    elif bot.client.users.get(other) is None:
+        # Not visible right now: the argument may be an account name
+        prof = store.get_profile(bot._account_key(other))
+    if not prof and account and bot.legacy_profiles:
+        prof = store.get_profile(ProfileStore.account_key(account))
+    if not prof and not bot.cfg.get("profile_require_account", False):
+        prof = store.get_profile(bot._nick_key(other))
+        if not prof and bot.legacy_profiles:
+            prof = store.get_profile(other)
+    if not prof:
+        asyncio.create_task(send(f"No profile found for {other}."))
+        return
+    parts = [f"{k}={v}" for k, v in prof.items()]
+    # Keep message reasonably short; split if necessary
+    msg = f"Profile for {other}: " + ", ".join(parts)
+    if len(msg) > 400:
+        # Split into chunks
+        chunks = []
+        cur = ""
+        for p in parts:
+            if len(cur) + len(p) + 2 > 380:
+                chunks.append(cur)
+                cur = p
+            else:
+                cur = p if not cur else (cur + ", " + p)
+        if cur:
+            chunks.append(cur)
+        asyncio.create_task(send(f"Profile for {other}:"))
+        for c in chunks:
+            asyncio.create_task(send(c))
+    else:
+        asyncio.create_task(send(msg))
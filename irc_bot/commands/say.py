@@ -0,0 +1,162 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from ..irc_client import irc_lower
+
+# Longest text chunk sent by !say, in bytes
+SAY_CHUNK_BYTES = 380
+
+
+def chunk_text(text: str, limit: int) -> List[str]:
+    """Split text on word boundaries into chunks of at most `limit` UTF-8 bytes."""
+    chunks: List[str] = []
+    cur = ""
+    for word in text.split():
+        # Hard-split words that cannot fit on a line by themselves
+        while len(word.encode("utf-8")) > limit:
+            cut = limit
+            while len(word[:cut].encode("utf-8")) > limit:
+                cut -= 1
+            if cur:
+                chunks.append(cur)
+                cur = ""
+            chunks.append(word[:cut])
+            word = word[cut:]
+        if not word:
+            continue
+        candidate = word if not cur else cur + " " + word
+        if len(candidate.encode("utf-8")) > limit:
+            chunks.append(cur)
+            cur = word
+        else:
+            cur = candidate
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+
+def pack_targets(targets: List[str], max_targets: Optional[int], room: int) -> List[List[str]]:
+    """Group targets into comma-joined lists of at most `max_targets` and `room` bytes."""
+    groups: List[List[str]] = []
+    cur: List[str] = []
+    size = 0
+    for t in targets:
+        tlen = len(t.encode("utf-8"))
+        extra = tlen if not cur else tlen + 1
+        if cur and (size + extra > room or (max_targets is not None and len(cur) >= max_targets)):
+            groups.append(cur)
+            cur, size, extra = [], 0, tlen
+        cur.append(t)
+        size += extra
+    if cur:
+        groups.append(cur)
+    return groups
+
+
+# DM-based say: user DMs the bot, bot speaks in the configured channel,
+# or broadcasts to a group (!say -to @group ...) or list (!say -to #a,#b ...)
+def cmd_say(bot, target: str, nick: str, args: list[str]) -> None:
+    reply_to = bot.reply_target(target, nick)
+
+    async def reply(msg: str) -> None:
+        await bot.client.send_privmsg(reply_to, msg)
+
+    usage = "Usage: !say [-to @group|#chan1,#chan2] <message>"
+
+    # Require DM to the bot (target is bot's nick), not a channel
+    if target.startswith("#"):
+        asyncio.create_task(reply("Please DM the bot: !say <message>"))
+        return
+
+    # Broadcasts are explicit so a message may itself start with "#" or "@"
+    broadcast = bool(args) and args[0] == "-to"
+    if broadcast:
+        if len(args) < 2:
+            asyncio.create_task(reply(usage))
+            return
+        spec, args = args[1], args[2:]
+        if spec.startswith("@"):
+            channels = bot.cfg.get("say_groups", {}).get(spec[1:])
+            if channels is None:
+                groups = ", ".join("@" + g for g in sorted(bot.cfg.get("say_groups", {}))) or "none"
+                asyncio.create_task(reply(f"Unknown group '{spec}'. Groups: {groups}"))
+                return
+        else:
+            channels = [c for c in spec.split(",") if c]
+    else:
+        channel = bot.cfg.get("say_channel")
+        if not channel:
+            asyncio.create_task(reply("No say channel configured. Set `say_channel` in config.json."))
+            return
+        channels = [channel]
+
+    text = " ".join(args).strip()
+    if not text:
+        asyncio.create_task(reply(usage))
+        return
+
+    asyncio.create_task(_say(bot, reply_to, nick, channels, text, report=broadcast))
+
+
+async def _say(bot, reply_to: str, nick: str, channels: List[str], text: str, report: bool) -> None:
+    # Permissions: require op in each target channel unless disabled; or admin
+    is_admin = nick in bot.cfg.get("admins", [])
+    require_op = bot.cfg.get("say_require_op", True)
+    if require_op and not is_admin:
+        await bot.wait_synced(channels)
+    allowed: List[str] = []
+    skipped: List[str] = []
+    unique = set()
+    for ch in channels:
+        if irc_lower(ch) in unique:
+            continue
+        unique.add(irc_lower(ch))
+        if not (is_admin or not require_op or bot.client.is_op_or_above(ch, nick)):
+            skipped.append(f"{ch} (not op)")
+        elif not bot.client.in_channel(ch):
+            skipped.append(f"{ch} (not joined)")
+        else:
+            allowed.append(ch)
+
+    if not allowed:
+        if skipped and all(s.endswith("(not op)") for s in skipped):
+            msg = "Insufficient permissions. You must be a channel operator or listed admin."
+            await bot.client.send_privmsg(reply_to, msg)
+        else:
+            await bot.client.send_privmsg(reply_to, "Nothing sent. Skipped: " + ", ".join(skipped))
+        return
+
+    await _broadcast(bot, reply_to, allowed, skipped, text, report=report)
+
+
+async def _broadcast(bot, reply_to: str, channels: List[str], skipped: List[str], text: str, report: bool) -> None:
+    """Chunk text once, pack channels into TARGMAX-sized PRIVMSG lines and send them paced."""
+    room = bot.client.line_budget() - len("PRIVMSG  :")
+    longest = max(len(c.encode("utf-8")) for c in channels)
+    target_room = longest if len(channels) == 1 else max(longest, room // 3)
+    chunks = chunk_text(text, max(1, min(SAY_CHUNK_BYTES, room - target_room)))
+    chunk_bytes = max(len(c.encode("utf-8")) for c in chunks)
+    groups = pack_targets(channels, bot.client.max_targets("PRIVMSG"), room - chunk_bytes)
+
+    errors: Dict[str, str] = {}
+    bot._broadcast_errors.append(errors)
+    try:
+        lines = [f"PRIVMSG {','.join(g)} :{c}" for g in groups for c in chunks]
+        await asyncio.gather(*(bot.client.send_paced(line) for line in lines))
+        if report:
+            # Give the server a moment to reject targets we could not send to
+            await asyncio.sleep(bot.broadcast_error_grace)
+    finally:
+        bot._broadcast_errors.remove(errors)
+    if not report:
+        return
+
+    failed = [c for c in channels if irc_lower(c) in errors]
+    delivered = len(channels) - len(failed)
+    msg = f"Broadcast sent to {delivered} channel(s) in {len(lines)} line(s)."
+    if failed:
+        msg += " Failed: " + ", ".join(f"{c} ({errors[irc_lower(c)]})" for c in failed) + "."
+    if skipped:
+        msg += " Skipped: " + ", ".join(skipped) + "."
+    for part in chunk_text(msg, SAY_CHUNK_BYTES):
+        await bot.client.send_paced(f"PRIVMSG {reply_to} :{part}")
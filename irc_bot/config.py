@@ -1,6 +1,6 @@
 import json
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 REQUIRED_KEYS = [
     "server",
@@ -24,16 +24,26 @@ DEFAULTS = {
     "admins": [],
     "say_channel": None,
     "say_require_op": True,
+    "say_groups": {},
+    "flood_burst": 5,
+    "flood_interval": 2.0,
+    "profile_require_account": False,
+    "profiles_path": "profiles.json",
+    "profiles_format": "json",
+    "legacy_profiles": False,
+    "who_sync_interval": 1.0,
+    "seen_path": "seen.json",
+    "seen_flush_interval": 60,
+    "scrollback_lines": 500,
+    "scrollback_spill_dir": None,
+    "scrollback_segment_bytes": 1048576,
+    "scrollback_segments": 4,
+    "processes": 1,
     "debug": False,
 }
 
 
-def load_config(path: str = "config.json") -> Dict[str, Any]:
-    """Load and validate bot configuration from a JSON file.
-
-    The config file is expected at the project root. Create it from
-    `config.example.json` if it doesn't exist.
-    """
+def _read_config(path: str) -> Dict[str, Any]:
     cfg_path = Path(path)
     if not cfg_path.exists():
         raise FileNotFoundError(
@@ -41,8 +51,58 @@ def load_config(path: str = "config.json") -> Dict[str, Any]:
         )
 
     with cfg_path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+        return json.load(f)
+
 
+def load_config(path: str = "config.json") -> Dict[str, Any]:
+    """Load and validate bot configuration from a JSON file.
+
+    The config file is expected at the project root. Create it from
+    `config.example.json` if it doesn't exist.
+    """
+    return validate_config(_read_config(path))
+
+
+def load_networks(path: str = "config.json") -> List[Dict[str, Any]]:
+    """Load one validated config per network.
+
+    A config without a `networks` list describes a single network, exactly as
+    `load_config` reads it. With `networks`, every entry is merged over the
+    top-level keys, which act as shared defaults, and gets a unique `name`
+    (defaulting to its server). Per-network state files (`seen_path`,
+    `scrollback_spill_dir`) are suffixed with the name unless the entry sets
+    its own.
+    """
+    data = _read_config(path)
+    networks = data.pop("networks", None)
+    if networks is None:
+        return [validate_config(data)]
+    if not isinstance(networks, list) or not networks or not all(isinstance(n, dict) for n in networks):
+        raise ValueError("`networks` must be a non-empty list of objects")
+
+    result = []
+    names = set()
+    for net in networks:
+        merged = dict(data)
+        merged.update(net)
+        name = merged.get("name") or merged.get("server")
+        if not isinstance(name, str) or not name:
+            raise ValueError("Each network needs a `name` or `server` string")
+        if name in names:
+            raise ValueError(f"Duplicate network name: {name}")
+        names.add(name)
+        merged["name"] = name
+        if "seen_path" not in net:
+            seen = Path(merged.get("seen_path") or DEFAULTS["seen_path"])
+            merged["seen_path"] = str(seen.with_name(f"{seen.stem}-{name}{seen.suffix}"))
+        if "scrollback_spill_dir" not in net and merged.get("scrollback_spill_dir"):
+            merged["scrollback_spill_dir"] = str(Path(merged["scrollback_spill_dir"]) / name)
+        result.append(validate_config(merged))
+    return result
+
+
+def validate_config(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply defaults to a parsed config and validate it in place."""
     # Apply defaults
     for k, v in DEFAULTS.items():
         data.setdefault(k, v)
@@ -96,6 +156,55 @@ def load_config(path: str = "config.json") -> Dict[str, Any]:
         raise ValueError("`say_channel` must be a string channel name or null")
     if not isinstance(data.get("say_require_op", True), bool):
         raise ValueError("`say_require_op` must be a boolean")
+    say_groups = data.get("say_groups")
+    if not isinstance(say_groups, dict) or not all(
+        isinstance(chans, list) and all(isinstance(c, str) for c in chans) for chans in say_groups.values()
+    ):
+        raise ValueError("`say_groups` must map group names to lists of channel names")
+
+    # Outgoing flood control for paced sends (broadcasts)
+    burst = data.get("flood_burst")
+    if isinstance(burst, bool) or not isinstance(burst, int) or burst < 1:
+        raise ValueError("`flood_burst` must be a positive integer")
+    flood_interval = data.get("flood_interval")
+    if isinstance(flood_interval, bool) or not isinstance(flood_interval, (int, float)) or flood_interval <= 0:
+        raise ValueError("`flood_interval` must be a positive number of seconds")
+
+    if not isinstance(data.get("profile_require_account", False), bool):
+        raise ValueError("`profile_require_account` must be a boolean")
+    if not isinstance(data.get("profiles_path"), str):
+        raise ValueError("`profiles_path` must be a string")
+    if data.get("profiles_format") not in ("json", "binary"):
+        raise ValueError("`profiles_format` must be \"json\" or \"binary\"")
+    if not isinstance(data.get("legacy_profiles"), bool):
+        raise ValueError("`legacy_profiles` must be a boolean")
+
+    who_interval = data.get("who_sync_interval")
+    if isinstance(who_interval, bool) or not isinstance(who_interval, (int, float)) or who_interval < 0:
+        raise ValueError("`who_sync_interval` must be a non-negative number of seconds")
+
+    # Seen tracker persistence
+    if not isinstance(data.get("seen_path"), str):
+        raise ValueError("`seen_path` must be a string")
+    interval = data.get("seen_flush_interval")
+    if isinstance(interval, bool) or not isinstance(interval, (int, float)) or interval <= 0:
+        raise ValueError("`seen_flush_interval` must be a positive number of seconds")
+
+    # Scrollback buffer and optional on-disk spill
+    for key in ("scrollback_lines", "scrollback_segment_bytes", "scrollback_segments"):
+        value = data.get(key)
+        if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            raise ValueError(f"`{key}` must be a positive integer")
+    spill_dir = data.get("scrollback_spill_dir")
+    if spill_dir is not None and not isinstance(spill_dir, str):
+        raise ValueError("`scrollback_spill_dir` must be a directory path or null")
+
+    name = data.get("name")
+    if name is not None and not isinstance(name, str):
+        raise ValueError("`name` must be a string")
+    processes = data.get("processes")
+    if isinstance(processes, bool) or not isinstance(processes, int) or processes < 1:
+        raise ValueError("`processes` must be a positive integer")
 
     if not isinstance(data.get("debug", False), bool):
         raise ValueError("`debug` must be a boolean")
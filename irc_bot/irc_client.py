@@ -1,19 +1,53 @@
 import asyncio
 import ssl
 from typing import Callable, Optional, Dict, Any, List, Tuple
-from collections import defaultdict
+
+
+_TAG_UNESCAPE = {":": ";", "s": " ", "\\": "\\", "r": "\r", "n": "\n"}
+
+
+def _unescape_tag_value(value: str) -> str:
+    if "\\" not in value:
+        return value
+    out = []
+    i = 0
+    while i < len(value):
+        ch = value[i]
+        if ch == "\\" and i + 1 < len(value):
+            nxt = value[i + 1]
+            out.append(_TAG_UNESCAPE.get(nxt, nxt))
+            i += 2
+            continue
+        if ch != "\\":
+            out.append(ch)
+        i += 1
+    return "".join(out)
 
 
 def parse_irc_message(line: str) -> Dict[str, Any]:
     """Parse a single IRC message line into components.
 
-    Returns a dict with keys: prefix, command, params (list), trailing.
+    Returns a dict with keys: tags (dict), prefix, command, params (list), trailing.
     """
     original = line
     line = line.rstrip("\r\n")
+    tags: Dict[str, str] = {}
     prefix = None
     trailing = None
 
+    # IRCv3 message tags: @key=value;key2 :prefix COMMAND ...
+    if line.startswith("@"):
+        try:
+            raw_tags, line = line[1:].split(" ", 1)
+        except ValueError:
+            raw_tags, line = line[1:], ""
+        for item in raw_tags.split(";"):
+            if not item:
+                continue
+            key, _, value = item.partition("=")
+            tags[key] = _unescape_tag_value(value)
+        line = line.lstrip(" ")
+
     if line.startswith(":"):
         try:
             prefix, line = line[1:].split(" ", 1)
@@ -30,6 +64,7 @@ def parse_irc_message(line: str) -> Dict[str, Any]:
     params = parts[1:] if len(parts) > 1 else []
 
     return {
+        "tags": tags,
         "prefix": prefix,
         "command": command,
         "params": params,
@@ -38,7 +73,208 @@ def parse_irc_message(line: str) -> Dict[str, Any]:
     }
 
 
+_RFC1459_LOWER = str.maketrans(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ[]\\~",
+    "abcdefghijklmnopqrstuvwxyz{}|^",
+)
+
+
+def irc_lower(name: str) -> str:
+    """Case-fold a nick or channel name using RFC 1459 casemapping."""
+    return name.translate(_RFC1459_LOWER)
+
+
+_NAMES_PREFIXES = "@&~%+"
+# NAMES/WHO member prefix -> channel mode letter
+_PREFIX_MODES = {"@": "o", "&": "a", "~": "q", "%": "h", "+": "v"}
+
+
+def _logged_in(account: Optional[str]) -> Optional[str]:
+    # "*" (extended-join, ACCOUNT) and "0" (WHOX) mean not logged in
+    return None if account in ("*", "0", "") else account
+
+
+class UserInfo:
+    """What the bot knows about one visible user."""
+
+    __slots__ = ("nick", "account", "user", "host", "away", "channels")
+
+    def __init__(self, nick: str) -> None:
+        self.nick = nick
+        self.account: Optional[str] = None
+        self.user: Optional[str] = None
+        self.host: Optional[str] = None
+        self.away = False
+        # Lowered channel -> this user's mode letters there {q,a,o,h,v}
+        self.channels: Dict[str, set] = {}
+
+
+class UserIndex:
+    """Nick -> user index (account, channels and roles) kept current from the event stream.
+
+    Roles live on the member entry itself, so they follow a NICK and go away
+    with PART, KICK and QUIT like the membership does.
+
+    Accounts come from `account-tag` on any message, `extended-join`,
+    `account-notify` (ACCOUNT) and, where available, WHOX replies. NICK renames
+    the entry and QUIT drops it; users are also forgotten once they no longer
+    share a channel with the bot, so a stale account is never attached to
+    whoever picks up the nick later. Senders outside the bot's channels (e.g.
+    in a DM) are not cached at all: only the account tag of their latest
+    message is kept, for the command that message carries.
+    """
+
+    def __init__(self, me: str = "") -> None:
+        self.me = me
+        # Set by the client once `account-tag` is acknowledged: a message
+        # without the tag then means the sender is not logged in.
+        self.account_tag = False
+        self._users: Dict[str, UserInfo] = {}
+        # (lowered nick, account) from the latest tagged message of an unknown sender
+        self._sender: Tuple[str, Optional[str]] = ("", None)
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def get(self, nick: str) -> Optional[UserInfo]:
+        return self._users.get(irc_lower(nick))
+
+    def account(self, nick: str) -> Optional[str]:
+        key = irc_lower(nick)
+        user = self._users.get(key)
+        if user is not None:
+            return user.account
+        return self._sender[1] if self._sender[0] == key else None
+
+    def _user(self, nick: str) -> UserInfo:
+        key = irc_lower(nick)
+        user = self._users.get(key)
+        if user is None:
+            user = self._users[key] = UserInfo(nick)
+        return user
+
+    def roles(self, nick: str, channel: str) -> set:
+        """Mode letters of `nick` in `channel`; empty if not a known member."""
+        user = self._users.get(irc_lower(nick))
+        if user is None:
+            return set()
+        return user.channels.get(irc_lower(channel), set())
+
+    def member_roles(self, nick: str, channel: str) -> set:
+        """The mutable role set of `nick` in `channel`, adding the membership if needed."""
+        return self._user(nick).channels.setdefault(irc_lower(channel), set())
+
+    def set_account(self, nick: str, account: Optional[str]) -> None:
+        # Only users sharing a channel are tracked; see the class docstring
+        user = self._users.get(irc_lower(nick))
+        if user is not None:
+            user.account = _logged_in(account)
+
+    def add_to_channel(self, nick: str, channel: str) -> UserInfo:
+        user = self._user(nick)
+        user.channels.setdefault(irc_lower(channel), set())
+        return user
+
+    def remove_from_channel(self, nick: str, channel: str) -> None:
+        if irc_lower(nick) == irc_lower(self.me):
+            self._forget_channel(irc_lower(channel))
+            return
+        key = irc_lower(nick)
+        user = self._users.get(key)
+        if user is None:
+            return
+        user.channels.pop(irc_lower(channel), None)
+        if not user.channels:
+            del self._users[key]
+
+    def _forget_channel(self, chan: str) -> None:
+        for key in [k for k, u in self._users.items() if chan in u.channels]:
+            user = self._users[key]
+            user.channels.pop(chan, None)
+            if not user.channels:
+                del self._users[key]
+
+    def rename(self, old: str, new: str) -> None:
+        if irc_lower(old) == irc_lower(self.me):
+            self.me = new
+        user = self._users.pop(irc_lower(old), None)
+        if user is None:
+            return
+        user.nick = new
+        self._users[irc_lower(new)] = user
+
+    def remove(self, nick: str) -> None:
+        self._users.pop(irc_lower(nick), None)
+
+    def handle_message(self, msg: Dict[str, Any]) -> None:
+        cmd = msg["command"]
+        prefix = msg.get("prefix") or ""
+        params = msg.get("params") or []
+        trailing = msg.get("trailing")
+        nick = prefix.split("!", 1)[0] if "!" in prefix else ""
+
+        if cmd == "353":
+            channel = params[-1] if params else ""
+            for token in (trailing or "").split():
+                name = token.lstrip(_NAMES_PREFIXES)
+                if channel and name:
+                    # Several prefixes with multi-prefix, e.g. "@+alice"
+                    roles = self.member_roles(name, channel)
+                    roles.update(_PREFIX_MODES[p] for p in token[: len(token) - len(name)])
+            return
+
+        if not nick:
+            return
+
+        if cmd == "QUIT":
+            self.remove(nick)
+            return
+
+        if cmd == "JOIN":
+            channel = params[0] if params else (trailing or "")
+            user = self.add_to_channel(nick, channel)
+            user.user, _, user.host = prefix.split("!", 1)[1].partition("@")
+            # extended-join: JOIN <channel> <account> :<realname>
+            if len(params) > 1:
+                self.set_account(nick, params[1])
+                return
+        elif cmd == "PART":
+            if params:
+                self.remove_from_channel(nick, params[0])
+            return
+        elif cmd == "KICK":
+            if len(params) > 1:
+                self.remove_from_channel(params[1], params[0])
+            return
+        elif cmd == "NICK":
+            new = params[0] if params else (trailing or "")
+            if new:
+                self.rename(nick, new)
+            return
+        elif cmd == "ACCOUNT":
+            self.set_account(nick, params[0] if params else (trailing or ""))
+            return
+        elif cmd == "AWAY":
+            # away-notify: AWAY :<reason> when going away, bare AWAY when back
+            user = self._users.get(irc_lower(nick))
+            if user is not None:
+                user.away = bool(trailing or params)
+            return
+
+        if self.account_tag:
+            account = msg.get("tags", {}).get("account")
+            if irc_lower(nick) in self._users:
+                self.set_account(nick, account)
+            else:
+                self._sender = (irc_lower(nick), _logged_in(account))
+
+
 class IRCClient:
+    # IRCv3 capabilities requested when the server offers them (sasl is added when enabled)
+    WANTED_CAPS = ("account-notify", "account-tag", "away-notify", "extended-join")
+    # WHOX fields requested on channel sync: token, channel, user, host, nick, flags, account
+    WHOX_FIELDS = "tcuhnfa"
+
     def __init__(
         self,
         server: str,
@@ -55,6 +291,10 @@ class IRCClient:
         nickserv_enabled: bool = False,
         nickserv_username: Optional[str] = None,
         nickserv_password: Optional[str] = None,
+        debug: bool = False,
+        who_interval: float = 1.0,
+        flood_burst: int = 5,
+        flood_interval: float = 2.0,
     ) -> None:
         self.server = server
         self.port = port
@@ -63,7 +303,6 @@ class IRCClient:
         self.username = username
         self.realname = realname
         self.password = password
-            debug: bool = False,
         self.channels = channels or []
         self.sasl_enabled = sasl_enabled
         self.sasl_username = sasl_username
@@ -78,13 +317,31 @@ class IRCClient:
         # Callbacks
         self.on_welcome: Optional[Callable[[], None]] = None
         self.on_privmsg: Optional[Callable[[str, str, str], None]] = None  # nick, target, message
-
-            self.debug = debug
-        # Channel user modes: channel -> nick -> set of mode letters {q,a,o,h,v}
-        self.channel_modes: Dict[str, Dict[str, set]] = defaultdict(lambda: defaultdict(set))
-            if self.debug:
-                print(f"-> JOIN {channel}")
-            await self.send_raw(f"JOIN {channel}")
+        # Raw event stream: every parsed message, after the client's own bookkeeping
+        self.on_message: Optional[Callable[[Dict[str, Any]], None]] = None
+
+        self.debug = debug
+        # Visible users: accounts, channels and their modes in each
+        self.users = UserIndex(nickname)
+        # Capabilities offered by the server (CAP LS) and acknowledged (CAP ACK)
+        self.caps_available: set = set()
+        self.caps: set = set()
+        self._cap_ended: bool = False
+        # RPL_ISUPPORT (005) tokens, e.g. {"WHOX": "", "TARGMAX": "PRIVMSG:4,..."}
+        self.isupport: Dict[str, str] = {}
+        # Channel sync: one WHO per joined channel, paced by who_interval seconds
+        self.who_interval = who_interval
+        self.who_timeout = 30.0
+        self._sync_queue: Optional[asyncio.Queue] = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self._synced: Dict[str, asyncio.Event] = {}
+        self._who_tokens: Dict[str, str] = {}  # WHOX query token -> channel key
+        self._who_token_seq = 0
+        # Flood control for send_paced(): up to flood_burst lines at once, then one per flood_interval
+        self.flood_burst = flood_burst
+        self.flood_interval = flood_interval
+        self._paced_queue: Optional[asyncio.Queue] = None
+        self._paced_task: Optional[asyncio.Task] = None
         # Internal SASL state
         self._sasl_requested: bool = False
         self._sasl_in_progress: bool = False
@@ -124,12 +381,8 @@ class IRCClient:
             else:
                 raise
 
-                                if self.debug:
-                                    print("SASL: requested AUTHENTICATE PLAIN")
-        # Request SASL if enabled
-        if self.sasl_enabled:
-            await self.send_raw("CAP REQ :sasl")
-            self._sasl_requested = True
+        # Capability negotiation; SASL and account tracking are requested from the LS reply
+        await self.send_raw("CAP LS 302")
 
         # PASS for server-level password (not SASL)
         if self.password and not self.sasl_enabled:
@@ -139,8 +392,6 @@ class IRCClient:
         # USER <username> 0 * :<realname>
         await self.send_raw(f"USER {self.username} 0 * :{self.realname}")
 
-                            if self.debug:
-                                print("SASL: sent credentials payload")
     async def send_raw(self, data: str) -> None:
         if not self.writer:
             return
@@ -148,45 +399,90 @@ class IRCClient:
         await self.writer.drain()
 
     async def join(self, channel: str) -> None:
-                        if self.debug:
-                            print("SASL: success")
+        if self.debug:
+            print(f"-> JOIN {channel}")
         await self.send_raw(f"JOIN {channel}")
 
     async def send_privmsg(self, target: str, message: str) -> None:
         await self.send_raw(f"PRIVMSG {target} :{message}")
 
-                        if self.debug:
-                            print(f"SASL: failure numeric {cmd}")
+    async def send_paced(self, data: str) -> None:
+        """Queue a line behind the flood limiter and wait until it has been written."""
+        if self._paced_queue is None:
+            self._paced_queue = asyncio.Queue()
+        if self._paced_task is None:
+            self._paced_task = asyncio.create_task(self._paced_worker())
+        done = asyncio.get_running_loop().create_future()
+        self._paced_queue.put_nowait((data, done))
+        await done
+
+    async def _paced_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        tokens = float(self.flood_burst)
+        last = loop.time()
+        while True:
+            data, done = await self._paced_queue.get()
+            now = loop.time()
+            tokens = min(float(self.flood_burst), tokens + (now - last) / self.flood_interval)
+            last = now
+            if tokens < 1:
+                await asyncio.sleep((1 - tokens) * self.flood_interval)
+                tokens = 1.0
+                last = loop.time()
+            tokens -= 1
+            try:
+                await self.send_raw(data)
+            except Exception as e:
+                if not done.done():
+                    done.set_exception(e)
+                continue
+            if not done.done():
+                done.set_result(None)
+
+    def max_targets(self, command: str = "PRIVMSG") -> Optional[int]:
+        """Targets allowed per `command` from TARGMAX/MAXTARGETS; None means unlimited."""
+        targmax = self.isupport.get("TARGMAX")
+        if targmax is not None:
+            for item in targmax.split(","):
+                name, _, limit = item.partition(":")
+                if name.upper() == command.upper():
+                    return int(limit) if limit.isdigit() else None
+            return 1
+        maxtargets = self.isupport.get("MAXTARGETS")
+        if maxtargets and maxtargets.isdigit():
+            return int(maxtargets)
+        # Servers that advertise neither may still reject target lists
+        return 1
+
+    def line_budget(self) -> int:
+        """Bytes available for `COMMAND params :text` once the server prepends our prefix."""
+        linelen = self.isupport.get("LINELEN", "")
+        limit = int(linelen) if linelen.isdigit() else 512
+        me = self.users.get(self.nickname)
+        user = me.user if me and me.user else "~" + self.username[:9]
+        host = me.host if me and me.host else "x" * 63
+        # ":nick!user@host " prefix and the trailing CRLF
+        return limit - 2 - len(f":{self.nickname}!{user}@{host} ".encode("utf-8"))
+
+    def in_channel(self, channel: str) -> bool:
+        me = self.users.get(self.nickname)
+        return bool(me and irc_lower(channel) in me.channels)
+
     async def run(self) -> None:
         if not self.reader:
             raise RuntimeError("Client not connected. Call connect() first.")
 
         while True:
-                    if self.debug:
-                        params = msg.get("params", [])
-                        channel = params[-1] if params else ""
-                        print(f"Join: names list for {channel}")
             raw = await self.reader.readline()
             if not raw:
                 break
             line = raw.decode("utf-8", errors="ignore")
-                    if self.debug:
-                        params = msg.get("params", [])
-                        ch = params[0] if params else ""
-                        print(f"Mode change on {ch}: {' '.join(params[1:])}")
             msg = parse_irc_message(line)
-                # End of NAMES list means channel join completed
-                if cmd == "366":
-                    params = msg.get("params", [])
-                    ch = params[1] if len(params) > 1 else (params[0] if params else "")
-                    if self.debug:
-                        print(f"Joined {ch}")
             cmd = msg["command"].upper()
-                # Common join failure numerics
-                if cmd in {"471", "473", "474", "475", "476", "477"}:
-                    trailing = msg.get("trailing") or ""
-                    if self.debug:
-                        print(f"Join failed ({cmd}): {trailing}")
+            self.users.handle_message(msg)
+            if cmd == "NICK":
+                # Follow our own nick changes (UserIndex.rename tracks them)
+                self.nickname = self.users.me
 
             if cmd == "PING":
                 arg = msg.get("trailing") or (msg["params"][0] if msg["params"] else "server")
@@ -195,6 +491,10 @@ class IRCClient:
 
             # 001 = welcome message after successful registration
             if cmd == "001":
+                # The server may have truncated or altered our nick
+                if msg["params"]:
+                    self.nickname = msg["params"][0]
+                    self.users.me = self.nickname
                 if self.on_welcome:
                     self.on_welcome()
                 # If NickServ is enabled and SASL not used or failed, identify first
@@ -221,26 +521,61 @@ class IRCClient:
                 if self.on_privmsg:
                     self.on_privmsg(nick, target, text)
 
-            # RPL_NAMREPLY (353): build initial channel mode map from nick prefixes
-            if cmd == "353":
-                self._update_names_from_353(msg)
+            # RPL_NAMREPLY (353): members and their prefixes, recorded by UserIndex
+            if cmd == "353" and self.debug:
+                params = msg.get("params", [])
+                channel = params[-1] if params else ""
+                print(f"Join: names list for {channel}")
+
+            # End of NAMES list means channel join completed: sync its members
+            if cmd == "366":
+                params = msg.get("params", [])
+                ch = params[1] if len(params) > 1 else (params[0] if params else "")
+                if self.debug:
+                    print(f"Joined {ch}")
+                if ch:
+                    self.queue_sync(ch)
+
+            if cmd == "005":
+                self._update_isupport(msg)
+
+            # Our own JOIN: member data for the channel is stale until resynced
+            if cmd == "JOIN" and irc_lower((msg.get("prefix") or "").split("!", 1)[0]) == irc_lower(self.nickname):
+                params = msg.get("params", [])
+                ch = params[0] if params else (msg.get("trailing") or "")
+                self._sync_event(ch).clear()
+
+            # WHOX (354) / WHO (352) replies and end of WHO (315)
+            if cmd == "354":
+                self._update_from_whox(msg)
+            if cmd == "352":
+                self._update_from_who(msg)
+            if cmd == "315":
+                self._who_done(msg)
+
+            # Common join failure numerics
+            if cmd in {"471", "473", "474", "475", "476", "477"} and self.debug:
+                trailing = msg.get("trailing") or ""
+                print(f"Join failed ({cmd}): {trailing}")
 
             # MODE changes: update channel mode map
             if cmd == "MODE":
+                if self.debug:
+                    params = msg.get("params", [])
+                    ch = params[0] if params else ""
+                    print(f"Mode change on {ch}: {' '.join(params[1:])}")
                 self._update_modes(msg)
 
+            if self.on_message:
+                self.on_message(msg)
+
+            # Capability negotiation
+            if cmd == "CAP":
+                await self._handle_cap(msg)
+                continue
+
             # SASL negotiation
             if self.sasl_enabled and not self._sasl_done:
-                if cmd == "CAP":
-                    # Expect ACK :sasl
-                    params = msg.get("params", [])
-                    subcmd = params[1] if len(params) > 1 else ""
-                    if subcmd.upper() == "ACK":
-                        trailing = msg.get("trailing") or ""
-                        if "sasl" in trailing.lower():
-                            await self.send_raw("AUTHENTICATE PLAIN")
-                            self._sasl_in_progress = True
-                            continue
                 if cmd == "AUTHENTICATE" and self._sasl_in_progress:
                     # Server sends '+' to request payload
                     plus = msg.get("params") or []
@@ -253,87 +588,225 @@ class IRCClient:
                         payload = f"{authzid}\0{authcid}\0{passwd}".encode("utf-8")
                         b64 = base64.b64encode(payload).decode("ascii")
                         await self.send_raw(f"AUTHENTICATE {b64}")
+                        if self.debug:
+                            print("SASL: sent credentials payload")
                         continue
                 # Numeric replies for SASL
                 if cmd in {"903"}:  # RPL_SASLSUCCESS
-                    await self.send_raw("CAP END")
+                    if self.debug:
+                        print("SASL: success")
                     self._sasl_done = True
                     self._sasl_success = True
                     self._sasl_in_progress = False
+                    await self._end_cap()
                     continue
                 if cmd in {"904", "905", "906", "907"}:  # various SASL failures
-                    await self.send_raw("CAP END")
+                    if self.debug:
+                        print(f"SASL: failure numeric {cmd}")
                     self._sasl_done = True
                     self._sasl_in_progress = False
+                    await self._end_cap()
                     continue
 
+    async def _handle_cap(self, msg: Dict[str, Any]) -> None:
+        params = msg.get("params", [])
+        subcmd = params[1].upper() if len(params) > 1 else ""
+        caps = (msg.get("trailing") or "").split()
+        if subcmd == "LS":
+            for cap in caps:
+                self.caps_available.add(cap.split("=", 1)[0])
+            if len(params) > 2 and params[2] == "*":
+                return  # multi-line LS, more to come
+            wanted = [c for c in self.WANTED_CAPS if c in self.caps_available]
+            if self.sasl_enabled and "sasl" in self.caps_available:
+                wanted.append("sasl")
+                self._sasl_requested = True
+            if wanted:
+                await self.send_raw("CAP REQ :" + " ".join(wanted))
+            else:
+                await self._end_cap()
+        elif subcmd == "ACK":
+            for cap in caps:
+                if cap.startswith("-"):
+                    self.caps.discard(cap[1:])
+                else:
+                    self.caps.add(cap)
+            self.users.account_tag = "account-tag" in self.caps
+            if self.sasl_enabled and "sasl" in caps and not self._sasl_done:
+                await self.send_raw("AUTHENTICATE PLAIN")
+                if self.debug:
+                    print("SASL: requested AUTHENTICATE PLAIN")
+                self._sasl_in_progress = True
+            else:
+                await self._end_cap()
+        elif subcmd == "NAK":
+            await self._end_cap()
+
+    async def _end_cap(self) -> None:
+        if self._cap_ended:
+            return
+        self._cap_ended = True
+        if not self._sasl_in_progress:
+            # SASL was not offered or not acknowledged; NickServ fallback applies
+            self._sasl_done = True
+        await self.send_raw("CAP END")
+
     async def _delayed_join(self) -> None:
         # Delay to allow NickServ to identify
         await asyncio.sleep(2)
         for ch in self.channels:
             await self.join(ch)
 
-    # Permissions helpers
-    def is_op_or_above(self, channel: str, nick: str) -> bool:
-        roles = self.channel_modes.get(channel, {}).get(nick, set())
-        return any(r in roles for r in ("o", "a", "q"))
+    # Channel sync
+    def queue_sync(self, channel: str) -> None:
+        """Schedule a WHO for `channel`; queries are sent one at a time."""
+        self._sync_event(channel).clear()
+        if self._sync_queue is None:
+            self._sync_queue = asyncio.Queue()
+        self._sync_queue.put_nowait(channel)
+        if self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._sync_worker())
+
+    def is_synced(self, channel: str) -> bool:
+        event = self._synced.get(irc_lower(channel))
+        return bool(event and event.is_set())
+
+    def sync_pending(self, channel: str) -> bool:
+        """True while a WHO sync for `channel` is queued or in flight."""
+        event = self._synced.get(irc_lower(channel))
+        return bool(event and not event.is_set())
+
+    async def wait_synced(self, channel: str, timeout: Optional[float] = None) -> bool:
+        """Wait until the WHO sync for `channel` has completed. Returns False on timeout."""
+        try:
+            await asyncio.wait_for(self._sync_event(channel).wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def _sync_event(self, channel: str) -> asyncio.Event:
+        key = irc_lower(channel)
+        event = self._synced.get(key)
+        if event is None:
+            event = self._synced[key] = asyncio.Event()
+        return event
+
+    async def _sync_worker(self) -> None:
+        while True:
+            channel = await self._sync_queue.get()
+            event = self._sync_event(channel)
+            if "WHOX" in self.isupport:
+                self._who_token_seq = self._who_token_seq % 999 + 1
+                token = str(self._who_token_seq)
+                self._who_tokens[token] = irc_lower(channel)
+                await self.send_raw(f"WHO {channel} %{self.WHOX_FIELDS},{token}")
+            else:
+                await self.send_raw(f"WHO {channel}")
+            try:
+                await asyncio.wait_for(event.wait(), self.who_timeout)
+            except asyncio.TimeoutError:
+                if self.debug:
+                    print(f"WHO sync for {channel} timed out")
+            # Pace queries so syncing many channels does not trip excess flood
+            await asyncio.sleep(self.who_interval)
+
+    def _update_isupport(self, msg: Dict[str, Any]) -> None:
+        # :server 005 <nick> TOKEN TOKEN=value ... :are supported by this server
+        for token in msg.get("params", [])[1:]:
+            if token.startswith("-"):
+                self.isupport.pop(token[1:], None)
+                continue
+            key, _, value = token.partition("=")
+            self.isupport[key] = value
+
+    def _apply_who_flags(self, channel: str, nick: str, flags: str) -> None:
+        user = self.users.add_to_channel(nick, channel)
+        user.away = flags.startswith("G")
+        # WHO is authoritative: replace roles learned from NAMES/MODE
+        roles = user.channels[irc_lower(channel)]
+        roles.clear()
+        roles.update(_PREFIX_MODES[ch] for ch in flags[1:] if ch in _PREFIX_MODES)
+
+    def _update_from_whox(self, msg: Dict[str, Any]) -> None:
+        # :server 354 <me> <token> <channel> <user> <host> <nick> <flags> <account>
+        fields = msg.get("params", [])[1:]
+        if msg.get("trailing") is not None:
+            fields.append(msg["trailing"])
+        if len(fields) < 7 or fields[0] not in self._who_tokens:
+            return
+        _, channel, username, host, nick, flags, account = fields[:7]
+        self._apply_who_flags(channel, nick, flags)
+        user = self.users.get(nick)
+        user.user = username
+        user.host = host
+        self.users.set_account(nick, account)
+
+    def _update_from_who(self, msg: Dict[str, Any]) -> None:
+        # :server 352 <me> <channel> <user> <host> <server> <nick> <flags> :<hops> <realname>
+        params = msg.get("params", [])
+        if len(params) < 7 or params[1] == "*":
+            return
+        _, channel, username, host, _, nick, flags = params[:7]
+        self._apply_who_flags(channel, nick, flags)
+        user = self.users.get(nick)
+        user.user = username
+        user.host = host
 
-    # Internal: parse 353 names list
-    def _update_names_from_353(self, msg: Dict[str, Any]) -> None:
+    def _who_done(self, msg: Dict[str, Any]) -> None:
         params = msg.get("params", [])
-        channel = params[-1] if params else ""
-        names_str = msg.get("trailing") or ""
-        if not channel or not names_str:
+        if len(params) < 2:
             return
-        for token in names_str.split():
-            prefix = token[0]
-            name = token
-            mode = None
-            if prefix in ("@", "&", "~", "%", "+"):
-                name = token[1:]
-                mode = {
-                    "@": "o",
-                    "&": "a",
-                    "~": "q",
-                    "%": "h",
-                    "+": "v",
-                }[prefix]
-            if name:
-                if mode:
-                    self.channel_modes[channel][name].add(mode)
-                else:
-                    # Ensure entry exists
-                    _ = self.channel_modes[channel][name]
+        key = irc_lower(params[1])
+        for token in [t for t, k in self._who_tokens.items() if k == key]:
+            del self._who_tokens[token]
+        event = self._synced.get(key)
+        if event is not None:
+            event.set()
+
+    # Permissions helpers
+    def is_op_or_above(self, channel: str, nick: str) -> bool:
+        roles = self.users.roles(nick, channel)
+        return any(r in roles for r in ("o", "a", "q"))
 
     # Internal: parse MODE change
     def _update_modes(self, msg: Dict[str, Any]) -> None:
         params = msg.get("params", [])
-        if not params:
-            return
+        if len(params) < 2 or not params[0].startswith(("#", "&")):
+            return  # user modes
         channel = params[0]
-        if len(params) < 2:
-            return
         modes = params[1]
         args = params[2:]
+        if msg.get("trailing") is not None:
+            args.append(msg["trailing"])
+        # CHANMODES=A,B,C,D: A and B always take an argument, C only when set
+        groups = (self.isupport.get("CHANMODES") or "beI,k,l,imnpst").split(",") + ["", "", ""]
+        always, when_set = set(groups[0] + groups[1]), set(groups[2])
         sign = "+"
         i = 0
-        need_arg = set("qahov")
         for ch in modes:
             if ch in "+-":
                 sign = ch
                 continue
-            if ch in need_arg:
+            if ch in _PREFIX_MODES.values():
                 if i >= len(args):
                     break
                 nick = args[i]
                 i += 1
-                role = ch
+                # Only members can be given a channel mode
+                roles = self.users.member_roles(nick, channel)
                 if sign == "+":
-                    self.channel_modes[channel][nick].add(role)
+                    roles.add(ch)
                 else:
-                    self.channel_modes[channel][nick].discard(role)
+                    roles.discard(ch)
+            elif ch in always or (sign == "+" and ch in when_set):
+                i += 1
 
     async def close(self) -> None:
+        for task in (self._sync_task, self._paced_task):
+            if task is not None:
+                task.cancel()
+        self._sync_task = None
+        self._paced_task = None
         if self.writer:
             try:
                 self.writer.close()
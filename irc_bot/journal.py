@@ -0,0 +1,20 @@
+import os
+from pathlib import Path
+from typing import List
+
+
+def append_lines(path: Path, lines: List[str]) -> None:
+    """Append `lines` to the journal at `path`, one entry per line.
+
+    A writer that died mid-append leaves a last line without its newline.
+    A new line is started first so these entries are not glued onto the torn
+    one, which readers skip because it does not parse.
+    """
+    data = "".join(line + "\n" for line in lines).encode("utf-8")
+    with open(path, "a+b") as fh:
+        end = fh.seek(0, os.SEEK_END)
+        if end:
+            fh.seek(end - 1)
+            if fh.read(1) != b"\n":
+                data = b"\n" + data
+        fh.write(data)
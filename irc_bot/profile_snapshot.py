@@ -0,0 +1,252 @@
+"""Versioned binary snapshot of the profile store.
+
+Layout (little-endian):
+
+    header   magic "IRCPROF\\0", u16 version, u16 field count, u32 record count
+    schema   per field: u8 length + ASCII name
+    index    per record: u64 offset of its key, in UTF-8 key order
+    keys     per record: u16 key length + UTF-8 key + u64 offset of its entry
+    entries  u32 field bitmask, then per set field: u8 type + value
+             (0 str: u32 length + UTF-8, 1 int: i64, 2 other: u32 length + JSON)
+
+The reader memory-maps the file and binary-searches the index, so opening a
+snapshot reads only the header and a lookup decodes only its own entry. Keys
+are packed together away from the entries so a search touches few pages. The
+schema travels in the header: fields added to `FIELDS` later still read old
+snapshots, and fields the reader does not know land in `extra`.
+
+Convert an existing store with
+    python -m irc_bot.profile_snapshot profiles.json profiles.bin
+and back again by giving a `.json` destination.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from .profiles import FIELDS, ProfileRecord, ProfileStore
+
+MAGIC = b"IRCPROF\x00"
+VERSION = 1
+
+_HEADER = struct.Struct("<8sHHI")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_U64 = struct.Struct("<Q")
+_I64 = struct.Struct("<q")
+
+T_STR, T_INT, T_JSON = 0, 1, 2
+
+SCHEMA = FIELDS + ("extra",)
+
+
+def _encode_value(value) -> bytes:
+    if type(value) is int and -(1 << 63) <= value < (1 << 63):
+        return bytes((T_INT,)) + _I64.pack(value)
+    if isinstance(value, str):
+        raw = value.encode("utf-8")
+        return bytes((T_STR,)) + _U32.pack(len(raw)) + raw
+    raw = json.dumps(value, ensure_ascii=False).encode("utf-8")
+    return bytes((T_JSON,)) + _U32.pack(len(raw)) + raw
+
+
+def _encode_entry(rec: ProfileRecord) -> bytes:
+    mask = 0
+    values = []
+    for bit, field in enumerate(SCHEMA):
+        value = getattr(rec, field)
+        if value is None or (field == "extra" and not value):
+            continue
+        mask |= 1 << bit
+        values.append(_encode_value(value))
+    return b"".join([_U32.pack(mask)] + values)
+
+
+def write_snapshot(path: Union[str, Path], records: Dict[str, ProfileRecord]) -> None:
+    """Write `records` to `path` as a snapshot (not atomically; see ProfileStore._save)."""
+    _write(path, sorted((key.encode("utf-8"), _encode_entry(rec)) for key, rec in records.items()))
+
+
+def merge_snapshot(
+    path: Union[str, Path], reader: "SnapshotReader", changes: Dict[str, Optional[ProfileRecord]]
+) -> None:
+    """Write `reader`'s records with `changes` applied (None deletes) to `path`.
+
+    Unchanged entries are copied as stored, without decoding them.
+    """
+    changed = sorted((key.encode("utf-8"), rec) for key, rec in changes.items())
+    out: List[Tuple[bytes, bytes]] = []
+    i = 0
+    for raw_key, entry in reader.raw_items():
+        while i < len(changed) and changed[i][0] <= raw_key:
+            key, rec = changed[i]
+            if rec is not None:
+                out.append((key, _encode_entry(rec)))
+            i += 1
+            if key == raw_key:
+                break
+        else:
+            out.append((raw_key, entry))
+    out.extend((key, _encode_entry(rec)) for key, rec in changed[i:] if rec is not None)
+    _write(path, out)
+
+
+def _write(path: Union[str, Path], entries: List[Tuple[bytes, bytes]]) -> None:
+    """Write (UTF-8 key, encoded entry) pairs, sorted by key, as a snapshot."""
+    head = bytearray(_HEADER.pack(MAGIC, VERSION, len(SCHEMA), len(entries)))
+    for field in SCHEMA:
+        name = field.encode("ascii")
+        head += bytes((len(name),)) + name
+
+    key_start = len(head) + _U64.size * len(entries)
+    key_size = sum(_U16.size + len(raw) + _U64.size for raw, _ in entries)
+    entry_pos = key_start + key_size
+    index = array("Q")
+    key_table: List[bytes] = []
+    key_pos = key_start
+    for raw_key, entry in entries:
+        index.append(key_pos)
+        key_table.append(_U16.pack(len(raw_key)) + raw_key + _U64.pack(entry_pos))
+        key_pos += _U16.size + len(raw_key) + _U64.size
+        entry_pos += len(entry)
+    if sys.byteorder == "big":
+        index.byteswap()
+
+    with open(path, "wb") as fh:
+        fh.write(head)
+        fh.write(index.tobytes())
+        fh.writelines(key_table)
+        fh.writelines(entry for _, entry in entries)
+
+
+class SnapshotReader:
+    """Read-only view of a snapshot file with lazy per-record decoding."""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        with open(path, "rb") as fh:
+            if os.name == "nt":
+                # A mapped file cannot be replaced on Windows, which would block
+                # other writers' os.replace; read it into memory there instead.
+                self._buf = fh.read()
+            else:
+                self._buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, nfields, self._count = _HEADER.unpack_from(self._buf, 0)
+        except struct.error:
+            raise ValueError(f"{path}: truncated profile snapshot") from None
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a profile snapshot")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported profile snapshot version {version}")
+        pos = _HEADER.size
+        fields = []
+        for _ in range(nfields):
+            n = self._buf[pos]
+            fields.append(self._buf[pos + 1:pos + 1 + n].decode("ascii"))
+            pos += 1 + n
+        self._fields: Tuple[str, ...] = tuple(fields)
+        self._index = pos
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+
+    def _key_at(self, i: int) -> Tuple[bytes, int]:
+        """Return the i-th key and the offset of its entry."""
+        (pos,) = _U64.unpack_from(self._buf, self._index + i * _U64.size)
+        (n,) = _U16.unpack_from(self._buf, pos)
+        pos += _U16.size
+        (entry,) = _U64.unpack_from(self._buf, pos + n)
+        return self._buf[pos:pos + n], entry
+
+    def _decode(self, pos: int) -> ProfileRecord:
+        buf = self._buf
+        (mask,) = _U32.unpack_from(buf, pos)
+        pos += _U32.size
+        rec = ProfileRecord()
+        for bit, field in enumerate(self._fields):
+            if not mask & (1 << bit):
+                continue
+            kind = buf[pos]
+            if kind == T_INT:
+                (value,) = _I64.unpack_from(buf, pos + 1)
+                pos += 1 + _I64.size
+            else:
+                (n,) = _U32.unpack_from(buf, pos + 1)
+                start = pos + 1 + _U32.size
+                value = buf[start:start + n].decode("utf-8")
+                if kind == T_JSON:
+                    value = json.loads(value)
+                pos = start + n
+            if field == "extra":
+                for k, v in value.items():
+                    rec.set(k, v)
+            else:
+                rec.set(field, value)
+        return rec
+
+    def get(self, key: str) -> Optional[ProfileRecord]:
+        target = key.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid)[0] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count:
+            found, pos = self._key_at(lo)
+            if found == target:
+                return self._decode(pos)
+        return None
+
+    def keys(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self._key_at(i)[0].decode("utf-8")
+
+    def items(self) -> Iterator[Tuple[str, ProfileRecord]]:
+        for i in range(self._count):
+            key, pos = self._key_at(i)
+            yield key.decode("utf-8"), self._decode(pos)
+
+    def raw_items(self) -> Iterator[Tuple[bytes, bytes]]:
+        """Yield (UTF-8 key, encoded entry) in key order, re-encoded if written with another schema."""
+        same = self._fields == SCHEMA
+        # Entries are stored back to back in key order, so each ends where the next starts
+        for i in range(self._count):
+            key, pos = self._key_at(i)
+            if same:
+                end = self._key_at(i + 1)[1] if i + 1 < self._count else len(self._buf)
+                yield key, self._buf[pos:end]
+            else:
+                yield key, _encode_entry(self._decode(pos))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert a profile store between JSON and binary snapshot.")
+    parser.add_argument("src", help="existing profile file (JSON or snapshot)")
+    parser.add_argument("dst", help="file to write; a .json suffix writes JSON, anything else a snapshot")
+    args = parser.parse_args(argv)
+
+    src = ProfileStore(args.src)
+    src.reload()
+    records = src._materialize()
+    fmt = "json" if Path(args.dst).suffix.lower() == ".json" else "binary"
+
+    dst = ProfileStore(args.dst, fmt=fmt)
+    dst._rewrite(records)
+    dst.close()
+    print(f"Wrote {len(records)} profiles to {args.dst} ({fmt})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
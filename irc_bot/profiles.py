@@ -1,57 +1,602 @@
+import gc
 import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
-ALLOWED_KEYS = {"age", "gender", "position", "orientation", "location", "limits", "kinks", "seeking", "bio"}
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from .irc_client import irc_lower
+from .journal import append_lines
+
+# Record schema, in display order. The binary snapshot stores field names in
+# its header, so appending a field here stays readable by older snapshots.
+FIELDS = ("age", "gender", "position", "orientation", "location", "limits", "kinks", "seeking", "bio")
+ALLOWED_KEYS = set(FIELDS)
+
+# Fields drawn from a small vocabulary; their values are interned so each
+# distinct "NY" or "female" is held once however many profiles use it.
+INTERNED_FIELDS = frozenset({"gender", "position", "orientation", "location", "seeking"})
+
+# Profiles of identified users are keyed by services account, e.g. "$a:alice".
+# Nicks cannot contain "$" or ":", so these never collide with legacy nick keys.
+ACCOUNT_KEY_PREFIX = "$a:"
+# Nick-keyed profiles of a named network, e.g. "$n:libera:alice"
+NICK_KEY_PREFIX = "$n:"
+
+
+class ProfileFileError(Exception):
+    """The profile file exists but cannot be read, so it must not be written over."""
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive advisory lock on `path` (created if missing)."""
+    with open(path, "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            while True:
+                try:
+                    # LK_LOCK retries for ~10 seconds before raising
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ProfileRecord:
+    """One profile as a fixed-slot record; unset fields read as None.
+
+    Keys outside `FIELDS` found in an existing file (e.g. hand edits) are kept
+    in `extra` so a rewrite does not drop them.
+    """
+
+    __slots__ = FIELDS + ("extra",)
+
+    # No __init__: slots start unset and read as None through __getattr__,
+    # which keeps creating a record (once per profile on load) cheap.
+    def __getattr__(self, name: str) -> Any:
+        if name in _SLOTS:
+            return None
+        raise AttributeError(name)
+
+    def set(self, field: str, value: Any) -> None:
+        if field not in ALLOWED_KEYS:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[field] = value
+            return
+        if field in INTERNED_FIELDS and type(value) is str:
+            value = _intern(value)
+        setattr(self, field, value)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ProfileRecord":
+        rec = cls()
+        for field, value in data.items():
+            rec.set(field, value)
+        return rec
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = {}
+        for field in FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                out[field] = value
+        if self.extra:
+            out.update(self.extra)
+        return out
+
+    def copy(self) -> "ProfileRecord":
+        rec = ProfileRecord()
+        for field in FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                setattr(rec, field, value)
+        if self.extra:
+            rec.extra = dict(self.extra)
+        return rec
+
+
+_SLOTS = frozenset(ProfileRecord.__slots__)
+_intern = sys.intern
+# Values that mean a decoded JSON object is not a profile (it holds one)
+_CONTAINERS = frozenset({ProfileRecord, dict, list})
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, ProfileRecord):
+        return {k: _plain(v) for k, v in value.to_dict().items()}
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
+
+
+def _record_hook(obj: Dict[str, Any]) -> Any:
+    # Innermost objects are profiles: turn each into a record as soon as it
+    # is decoded, so the whole file never exists as dicts at once.
+    if not _CONTAINERS.isdisjoint(map(type, obj.values())):
+        return obj
+    rec = ProfileRecord()
+    if obj.keys() <= ALLOWED_KEYS:
+        for field, value in obj.items():
+            if field in INTERNED_FIELDS and type(value) is str:
+                value = _intern(value)
+            setattr(rec, field, value)
+    else:
+        for field, value in obj.items():
+            rec.set(field, value)
+    return rec
+
+
+# Held while _loads_records has the garbage collector switched off
+_gc_paused = threading.Lock()
+
+
+def _loads_records(text: str) -> Dict[str, ProfileRecord]:
+    """Parse a JSON profile file straight into records."""
+    # Records are GC-tracked (dicts of plain values are not), so a large load
+    # would otherwise set off full collections over everything decoded so far:
+    # 2.8 s instead of 2.4 s for 300k profiles. gc.disable() is process-wide
+    # and this may run on the warm-up thread, so the event loop's cyclic
+    # garbage also waits until the parse ends. It is only memory, collected
+    # right after. The lock keeps two loads from overlapping, where the first
+    # to finish would switch collection back on under the other, or the
+    # second would see it off and never switch it back on.
+    with _gc_paused:
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            root = json.loads(text, object_hook=_record_hook)
+        finally:
+            if enabled:
+                gc.enable()
+    if isinstance(root, ProfileRecord) and not root.to_dict():
+        return {}
+    if not isinstance(root, dict):
+        raise ValueError("profile file must hold an object of profiles")
+    for key, value in root.items():
+        if not isinstance(value, ProfileRecord):
+            # A profile holding nested values (hand edits); rebuild it whole
+            root[key] = ProfileRecord.from_dict(_plain(value))
+    return root
+
+
+class _Loaded(NamedTuple):
+    # Replaced as a whole, so a lookup on another thread sees either the old
+    # or the new contents, never a mix of the two
+    data: Dict[str, ProfileRecord]
+    # Open reader while the file is a binary snapshot; `data` is then empty
+    snapshot: Any
+    # Journaled edits not yet compacted into the file; None marks a deletion.
+    # Never changed in place: an edit swaps in a new state.
+    overlay: Dict[str, Optional[ProfileRecord]]
+
+    def lookup(self, key: str) -> Optional[ProfileRecord]:
+        if key in self.overlay:
+            return self.overlay[key]
+        if self.snapshot is not None:
+            return self.snapshot.get(key)
+        return self.data.get(key)
+
+
+class _Changes:
+    """Dict-like view over a snapshot that records what a change makes of it."""
+
+    def __init__(self, state: _Loaded) -> None:
+        self._state = state
+        self.changes: Dict[str, Optional[ProfileRecord]] = {}
+
+    def _get(self, key: str) -> Optional[ProfileRecord]:
+        if key in self.changes:
+            return self.changes[key]
+        return self._state.lookup(key)
+
+    def __contains__(self, key: str) -> bool:
+        return self._get(key) is not None
+
+    def __getitem__(self, key: str) -> ProfileRecord:
+        rec = self._get(key)
+        if rec is None:
+            raise KeyError(key)
+        return rec
+
+    def __setitem__(self, key: str, rec: ProfileRecord) -> None:
+        self.changes[key] = rec
+
+    def __delitem__(self, key: str) -> None:
+        self.pop(key)
+
+    def pop(self, key: str) -> ProfileRecord:
+        rec = self[key]
+        self.changes[key] = None
+        return rec
 
 
 class ProfileStore:
-    def __init__(self, path: str = "profiles.json") -> None:
+    """Profiles in a file that may be shared with other processes.
+
+    Reads are served from memory and re-validated against the file's
+    (mtime, size, inode) at most every `check_interval` seconds, so outside
+    edits are picked up without a restart. Every write takes an advisory lock
+    on `<path>.lock`, reloads the file if it changed, applies the change to
+    that one record and atomically replaces the file. Concurrent writers
+    therefore only ever overwrite each other's fields when they touch the
+    same field of the same record.
+
+    The file is either JSON or a binary snapshot (see `profile_snapshot`);
+    which one is detected on load, and `fmt` ("json" or "binary") picks what
+    is written. A binary snapshot is memory-mapped and records are decoded
+    only when looked up, so loading costs the same at any size.
+
+    In binary mode an edit does not rewrite the snapshot: the changed records
+    are appended to a journal, `<path>.delta`, as JSON lines and held in
+    memory over the snapshot. Once the journal passes `compact_after` bytes a
+    background thread merges it into a new snapshot, taking the lock only to
+    start and to swap the files in.
+    """
+
+    # Journal size, in bytes, at which a binary store compacts it
+    compact_after = 256 * 1024
+
+    def __init__(self, path: str = "profiles.json", check_interval: float = 1.0, fmt: str = "json") -> None:
+        if fmt not in ("json", "binary"):
+            raise ValueError(f"Unknown profile format: {fmt}")
         self.path = Path(path)
-        self._data: Dict[str, Dict] = {}
+        self.lock_path = Path(str(self.path) + ".lock")
+        self.delta_path = Path(str(self.path) + ".delta")
+        self.check_interval = check_interval
+        self.fmt = fmt
+        self._state = _Loaded({}, None, {})
         self._loaded = False
+        # Why the file on disk could not be read, while it cannot
+        self._read_error: Optional[Exception] = None
+        self._sig: Tuple[Optional[Tuple[int, int, int]], ...] = (None, None)
+        self._checked_at = 0.0
+        # Guards loading against the background warm-up and compaction threads
+        self._mutex = threading.RLock()
+        self._compactor: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _stat_file(path: Path) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _stat(self) -> Tuple[Optional[Tuple[int, int, int]], ...]:
+        return (self._stat_file(self.path), self._stat_file(self.delta_path))
+
+    def _read_journal(self) -> Dict[str, Optional[ProfileRecord]]:
+        overlay: Dict[str, Optional[ProfileRecord]] = {}
+        try:
+            with open(self.delta_path, "rb") as fh:
+                lines = fh.read().splitlines()
+        except FileNotFoundError:
+            return overlay
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Still being appended by another process, or torn by a crash
+                continue
+            profile = entry["p"]
+            overlay[entry["k"]] = ProfileRecord.from_dict(profile) if profile is not None else None
+        return overlay
+
+    def _read(self) -> _Loaded:
+        # The journal is read before the file it amends: compaction replaces
+        # the file first, and replaying entries already folded in is harmless
+        overlay = self._read_journal()
+        try:
+            with open(self.path, "rb") as fh:
+                head = fh.read(8)
+        except FileNotFoundError:
+            return _Loaded({}, None, overlay)
+        from . import profile_snapshot
 
-    def _ensure_loaded(self) -> None:
-        if self._loaded:
+        if head == profile_snapshot.MAGIC:
+            return _Loaded({}, profile_snapshot.SnapshotReader(self.path), overlay)
+        return _Loaded(_loads_records(self.path.read_text(encoding="utf-8")), None, overlay)
+
+    def _ensure_loaded(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if self._loaded and not force and now - self._checked_at < self.check_interval:
             return
-        if self.path.exists():
+        with self._mutex:
+            self._checked_at = now
+            sig = self._stat()
+            if self._loaded and sig == self._sig:
+                return
             try:
-                self._data = json.loads(self.path.read_text(encoding="utf-8"))
-            except Exception:
-                self._data = {}
-        else:
-            self._data = {}
-        self._loaded = True
+                # An old reader is dropped rather than closed: a lookup on
+                # another thread may still hold it; it unmaps once unreferenced
+                self._state = self._read()
+                self._read_error = None
+            except Exception as exc:
+                # Unreadable (e.g. a bad hand edit): keep serving what we had,
+                # but writes are refused until the file is fixed
+                self._read_error = exc
+            self._sig = sig
+            self._loaded = True
+
+    def _lookup(self, key: str) -> Optional[ProfileRecord]:
+        return self._state.lookup(key)
+
+    def _check_readable(self) -> None:
+        if self._read_error is not None:
+            raise ProfileFileError(
+                f"{self.path} could not be read ({self._read_error}); fix or move it before changing profiles"
+            ) from self._read_error
+
+    def _materialize(self) -> Dict[str, ProfileRecord]:
+        """Decode a mapped snapshot and journaled edits into a dict that can be changed."""
+        state = self._state
+        if state.snapshot is not None or state.overlay:
+            data = dict(state.snapshot.items()) if state.snapshot is not None else dict(state.data)
+            for key, rec in state.overlay.items():
+                if rec is None:
+                    data.pop(key, None)
+                else:
+                    data[key] = rec
+            self._state = state = _Loaded(data, None, {})
+        return state.data
 
     def _save(self) -> None:
-        self.path.write_text(json.dumps(self._data, ensure_ascii=False, indent=2), encoding="utf-8")
+        data = self._state.data
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        if self.fmt == "binary":
+            from . import profile_snapshot
+
+            profile_snapshot.write_snapshot(tmp, data)
+        else:
+            raw = {key: rec.to_dict() for key, rec in data.items()}
+            tmp.write_text(json.dumps(raw, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+        try:
+            # Everything journaled is in the file just written
+            os.remove(self.delta_path)
+        except FileNotFoundError:
+            pass
+        self._sig = self._stat()
+        self._checked_at = time.monotonic()
+        if self.fmt == "binary":
+            # Drop the decoded copy and serve reads from the new mapping
+            self._state = self._read()
+
+    def _append(self, changes: Dict[str, Optional[ProfileRecord]]) -> None:
+        """Journal `changes` and lay them over the loaded snapshot."""
+        lines = [
+            json.dumps({"k": key, "p": rec.to_dict() if rec is not None else None}, ensure_ascii=False)
+            for key, rec in changes.items()
+        ]
+        append_lines(self.delta_path, lines)
+        state = self._state
+        self._state = state._replace(overlay={**state.overlay, **changes})
+        self._sig = self._stat()
+        self._checked_at = time.monotonic()
+        if self._sig[1] is not None and self._sig[1][1] >= self.compact_after:
+            if self._compactor is None or not self._compactor.is_alive():
+                self._compactor = threading.Thread(target=self.compact, name="profile-compact", daemon=True)
+                self._compactor.start()
+
+    def _modify(self, change: Callable[[Dict[str, ProfileRecord]], Tuple[Any, bool]]) -> Any:
+        """Apply `change` to freshly loaded data under the file lock; save if it reports a change."""
+        with self._mutex, _file_lock(self.lock_path):
+            self._ensure_loaded(force=True)
+            self._check_readable()
+            state = self._state
+            if self.fmt == "binary" and state.snapshot is not None:
+                view = _Changes(state)
+                result, changed = change(view)
+                if changed and view.changes:
+                    self._append(view.changes)
+            else:
+                result, changed = change(self._materialize())
+                if changed:
+                    self._save()
+        return result
+
+    def _rewrite(self, records: Dict[str, ProfileRecord]) -> None:
+        """Replace the whole store with `records`."""
+        with self._mutex, _file_lock(self.lock_path):
+            self._ensure_loaded(force=True)
+            self._check_readable()
+            self._state = _Loaded(records, None, {})
+            self._save()
+
+    def compact(self) -> bool:
+        """Fold the journal into a new snapshot; return whether one was written.
+
+        The merge runs without the lock, so edits keep being journaled
+        meanwhile; they are carried over to the new journal at the swap.
+        """
+        from . import profile_snapshot
+
+        with self._mutex, _file_lock(self.lock_path):
+            self._ensure_loaded(force=True)
+            state, sig, unreadable = self._state, self._sig, self._read_error is not None
+        if state.snapshot is None or not state.overlay or unreadable:
+            return False
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.compact")
+        try:
+            profile_snapshot.merge_snapshot(tmp, state.snapshot, state.overlay)
+            with self._mutex, _file_lock(self.lock_path):
+                if self._stat_file(self.path) != sig[0]:
+                    # Rewritten meanwhile, e.g. compacted by another process
+                    return False
+                with open(self.delta_path, "rb") as fh:
+                    fh.seek(sig[1][1])
+                    tail = fh.read()
+                os.replace(tmp, self.path)
+                if tail:
+                    tmp_delta = self.delta_path.with_name(f"{self.delta_path.name}.{os.getpid()}.tmp")
+                    tmp_delta.write_bytes(tail)
+                    os.replace(tmp_delta, self.delta_path)
+                else:
+                    os.remove(self.delta_path)
+                self._ensure_loaded(force=True)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return True
+
+    def reload(self) -> None:
+        """Re-read the file now if it changed, ignoring the check interval.
+
+        Raises ProfileFileError if the file cannot be read; lookups keep
+        answering from the last good copy meanwhile.
+        """
+        self._ensure_loaded(force=True)
+        self._check_readable()
+
+    def close(self) -> None:
+        """Release a mapped snapshot, if any; it is reopened on the next read."""
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._mutex:
+            state, self._state = self._state, _Loaded({}, None, {})
+            self._loaded = False
+        if state.snapshot is not None:
+            state.snapshot.close()
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        state = self._state
+        base = state.snapshot if state.snapshot is not None else state.data
+        count = len(base)
+        for key, rec in state.overlay.items():
+            count += (rec is not None) - (base.get(key) is not None)
+        return count
+
+    @staticmethod
+    def account_key(account: str, network: Optional[str] = None) -> str:
+        # Accounts are per network: "$a:<network>:<account>" when running several
+        if network:
+            return f"{ACCOUNT_KEY_PREFIX}{network}:{irc_lower(account)}"
+        return ACCOUNT_KEY_PREFIX + irc_lower(account)
+
+    @staticmethod
+    def nick_key(nick: str, network: Optional[str] = None) -> str:
+        # Nicks are per network too; a single unnamed network keeps the plain nick
+        if network:
+            return f"{NICK_KEY_PREFIX}{network}:{irc_lower(nick)}"
+        return nick
+
+    @staticmethod
+    def rename_network(key: str, old: Optional[str], new: str) -> Optional[str]:
+        """Re-key a profile of network `old` for network `new`, or None if `key` is not one of `old`'s.
+
+        `old` None means a single unnamed network: plain nick keys and
+        "$a:<account>" keys, as saved before the network had a name.
+        """
+        for prefix in (ACCOUNT_KEY_PREFIX, NICK_KEY_PREFIX):
+            if not key.startswith(prefix):
+                continue
+            rest = key[len(prefix):]
+            if old is None:
+                # Account names cannot contain ":", so a second one means a named network
+                if prefix == NICK_KEY_PREFIX or ":" in rest:
+                    return None
+                return f"{prefix}{new}:{rest}"
+            if rest.startswith(old + ":"):
+                return f"{prefix}{new}:{rest[len(old) + 1:]}"
+            return None
+        return ProfileStore.nick_key(key, new) if old is None else None
+
+    def import_network(
+        self, records: Dict[str, ProfileRecord], network: str, old: Optional[str] = None, move: bool = False
+    ) -> Tuple[int, int]:
+        """Add the profiles of network `old` in `records` under `network`.
+
+        Profiles already saved under the new key are kept. With `move`, the
+        old keys are removed from this store too (re-keying in place).
+        Returns (imported, skipped).
+        """
+
+        def change(data: Dict[str, ProfileRecord]) -> Tuple[Tuple[int, int], bool]:
+            imported = skipped = 0
+            for key, rec in records.items():
+                new_key = self.rename_network(key, old, network)
+                if new_key is None:
+                    continue
+                if new_key in data:
+                    skipped += 1
+                    continue
+                data[new_key] = rec
+                if move and key in data:
+                    del data[key]
+                imported += 1
+            return (imported, skipped), imported > 0
+
+        return self._modify(change)
+
+    def migrate(self, old_key: str, new_key: str) -> bool:
+        """Move a profile saved under `old_key` to `new_key` unless one already exists there."""
+        self._ensure_loaded()
+        if self._lookup(old_key) is None:
+            return False
+
+        def change(data: Dict[str, ProfileRecord]) -> Tuple[bool, bool]:
+            if old_key not in data or new_key in data:
+                return False, False
+            data[new_key] = data.pop(old_key)
+            return True, True
+
+        return self._modify(change)
 
     def get_profile(self, nick: str) -> Optional[Dict]:
         self._ensure_loaded()
-        return self._data.get(nick)
+        rec = self._lookup(nick)
+        return rec.to_dict() if rec is not None else None
 
     def clear_profile(self, nick: str) -> None:
-        self._ensure_loaded()
-        if nick in self._data:
-            del self._data[nick]
-            self._save()
+        def change(data: Dict[str, ProfileRecord]) -> Tuple[None, bool]:
+            if nick in data:
+                del data[nick]
+                return None, True
+            return None, False
+
+        self._modify(change)
 
     def update_profile(self, nick: str, updates: Dict[str, str]) -> Dict:
-        self._ensure_loaded()
-        profile = dict(self._data.get(nick) or {})
-        for k, v in updates.items():
-            if k not in ALLOWED_KEYS:
-                continue
-            if k == "age":
-                try:
-                    profile[k] = int(v)
-                except Exception:
-                    profile[k] = v  # store as-is if not int
-            else:
-                profile[k] = v
-        self._data[nick] = profile
-        self._save()
-        return profile
+        def change(data: Dict[str, ProfileRecord]) -> Tuple[Dict, bool]:
+            rec = data[nick].copy() if nick in data else ProfileRecord()
+            for k, v in updates.items():
+                if k not in ALLOWED_KEYS:
+                    continue
+                if k == "age":
+                    try:
+                        rec.set(k, int(v))
+                    except Exception:
+                        rec.set(k, v)  # store as-is if not int
+                else:
+                    rec.set(k, v)
+            data[nick] = rec
+            return rec.to_dict(), True
+
+        return self._modify(change)
 
     @staticmethod
     def parse_updates(tokens: list[str]) -> Dict[str, str]:
@@ -65,3 +610,34 @@ class ProfileStore:
             if k in ALLOWED_KEYS:
                 updates[k] = v
         return updates
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import profiles saved by another network setup under a network name.")
+    parser.add_argument("src", help="profile file to import (JSON or snapshot)")
+    parser.add_argument("dst", help="shared profile file to add them to; may be the same file")
+    parser.add_argument("--network", required=True, help="network `name` the profiles belong to now")
+    parser.add_argument(
+        "--from-network", help="network name they were saved under; omit for a single unnamed network"
+    )
+    parser.add_argument("--format", choices=("json", "binary"), default="json", help="format to write dst in")
+    args = parser.parse_args(argv)
+
+    src = ProfileStore(args.src)
+    src.reload()
+    records = dict(src._materialize())
+    dst = ProfileStore(args.dst, fmt=args.format)
+    move = Path(args.src).resolve() == Path(args.dst).resolve()
+    imported, skipped = dst.import_network(records, args.network, args.from_network, move=move)
+    dst.close()
+    print(f"Imported {imported} profiles into {args.dst} under {args.network}; kept {skipped} already there")
+    return 0
+
+
+if __name__ == "__main__":
+    # Run the package's copy of this module so records share one class with profile_snapshot
+    from irc_bot.profiles import main as _main
+
+    sys.exit(_main())
@@ -0,0 +1,276 @@
+import re
+import os
+import time
+from array import array
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from .irc_client import irc_lower
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# (ts, nick, text)
+Line = Tuple[int, str, str]
+
+
+def tokenize(text: str) -> set:
+    """Lower-cased word tokens used by the keyword index."""
+    return set(_TOKEN_RE.findall(text.lower()))
+
+
+class SegmentSpill:
+    """Append-only on-disk log of evicted lines, rotated across numbered segments.
+
+    Segments are named `<channel>.<n>.log`; once there are more than
+    `max_segments`, the oldest is deleted. Searches stream the files and never
+    load a whole segment into memory.
+    """
+
+    def __init__(self, directory: str, channel: str, segment_bytes: int = 1 << 20, max_segments: int = 4) -> None:
+        self.dir = Path(directory)
+        self.name = quote(irc_lower(channel), safe="")
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self._fh = None
+        self._size = 0
+        self._segments = self._existing_segments()
+        self._current = self._segments[-1] if self._segments else 0
+
+    def _existing_segments(self) -> List[int]:
+        found = []
+        if self.dir.is_dir():
+            prefix = self.name + "."
+            for p in self.dir.iterdir():
+                n = p.name
+                if n.startswith(prefix) and n.endswith(".log"):
+                    num = n[len(prefix):-4]
+                    if num.isdigit():
+                        found.append(int(num))
+        return sorted(found)
+
+    def _segment_path(self, n: int) -> Path:
+        return self.dir / f"{self.name}.{n}.log"
+
+    def append(self, ts: int, nick: str, text: str) -> None:
+        if self._fh is None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            path = self._segment_path(self._current)
+            self._fh = path.open("a", encoding="utf-8")
+            self._size = path.stat().st_size
+            if self._current not in self._segments:
+                self._segments.append(self._current)
+        line = f"{ts}\t{nick}\t{text}\n"
+        self._fh.write(line)
+        self._size += len(line)
+        if self._size >= self.segment_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        self.close()
+        self._current += 1
+        while len(self._segments) >= self.max_segments:
+            old = self._segments.pop(0)
+            try:
+                os.remove(self._segment_path(old))
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def search(self, tokens: set, nick_key: Optional[str], limit: int) -> List[Line]:
+        """Newest-first matches from the spilled segments."""
+        if self._fh is not None:
+            self._fh.flush()
+        results: List[Line] = []
+        for n in reversed(self._segments):
+            path = self._segment_path(n)
+            if not path.exists():
+                continue
+            found: deque = deque(maxlen=limit - len(results))
+            with path.open("r", encoding="utf-8") as f:
+                for raw in f:
+                    parts = raw.rstrip("\n").split("\t", 2)
+                    if len(parts) != 3:
+                        continue
+                    ts, nick, text = parts
+                    if nick_key is not None and irc_lower(nick) != nick_key:
+                        continue
+                    if tokens and not tokens <= tokenize(text):
+                        continue
+                    found.append((int(ts), nick, text))
+            results.extend(reversed(found))
+            if len(results) >= limit:
+                break
+        return results
+
+
+class ChannelScrollback:
+    """Bounded ring of recent lines for one channel with incremental indexes.
+
+    Lines live in preallocated slots addressed by a monotonically increasing
+    sequence number (`seq % capacity`). The token and nick indexes map to
+    ascending deques of sequence numbers, so evicting the oldest line only pops
+    from the left of the postings it appeared in. Memory per channel is capped
+    at `capacity` lines of at most `max_line` characters.
+    """
+
+    def __init__(self, capacity: int = 500, max_line: int = 400, spill: Optional[SegmentSpill] = None) -> None:
+        self.capacity = capacity
+        self.max_line = max_line
+        self.spill = spill
+        self._ts = array("q", bytes(8 * capacity))
+        self._nicks: List[Optional[str]] = [None] * capacity
+        self._texts: List[Optional[str]] = [None] * capacity
+        self._seq = 0
+        self._tokens: Dict[str, deque] = {}
+        self._by_nick: Dict[str, deque] = {}
+        self._nick_names: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return min(self._seq, self.capacity)
+
+    def append(self, nick: str, text: str, ts: Optional[int] = None) -> None:
+        if ts is None:
+            ts = int(time.time())
+        if len(text) > self.max_line:
+            text = text[: self.max_line]
+        seq = self._seq
+        if seq >= self.capacity:
+            self._evict(seq - self.capacity)
+        slot = seq % self.capacity
+        # Reuse one string object per nick across all of its lines
+        nick = self._nick_names.setdefault(nick, nick)
+        self._ts[slot] = ts
+        self._nicks[slot] = nick
+        self._texts[slot] = text
+        for tok in tokenize(text):
+            postings = self._tokens.get(tok)
+            if postings is None:
+                postings = self._tokens[tok] = deque()
+            postings.append(seq)
+        key = irc_lower(nick)
+        postings = self._by_nick.get(key)
+        if postings is None:
+            postings = self._by_nick[key] = deque()
+        postings.append(seq)
+        self._seq = seq + 1
+
+    def _evict(self, seq: int) -> None:
+        slot = seq % self.capacity
+        nick = self._nicks[slot]
+        text = self._texts[slot]
+        if self.spill is not None:
+            self.spill.append(self._ts[slot], nick, text)
+        for tok in tokenize(text):
+            self._drop_posting(self._tokens, tok, seq)
+        key = irc_lower(nick)
+        self._drop_posting(self._by_nick, key, seq)
+        if key not in self._by_nick:
+            self._nick_names.pop(nick, None)
+
+    @staticmethod
+    def _drop_posting(index: Dict[str, deque], key: str, seq: int) -> None:
+        postings = index.get(key)
+        if postings is None:
+            return
+        while postings and postings[0] <= seq:
+            postings.popleft()
+        if not postings:
+            del index[key]
+
+    def _line(self, seq: int) -> Line:
+        slot = seq % self.capacity
+        return (self._ts[slot], self._nicks[slot], self._texts[slot])
+
+    def search(self, pattern: str, limit: int = 3) -> List[Line]:
+        """Newest-first lines containing every word of `pattern`."""
+        tokens = tokenize(pattern)
+        if not tokens:
+            return []
+        postings = [self._tokens.get(t) for t in tokens]
+        results: List[Line] = []
+        if all(p is not None for p in postings):
+            # Walk the rarest token's postings and verify the candidates
+            rarest = min(postings, key=len)
+            for seq in reversed(rarest):
+                line = self._line(seq)
+                if len(tokens) == 1 or tokens <= tokenize(line[2]):
+                    results.append(line)
+                    if len(results) >= limit:
+                        return results
+        if self.spill is not None:
+            results.extend(self.spill.search(tokens, None, limit - len(results)))
+        return results
+
+    def last(self, nick: str, limit: int = 3) -> List[Line]:
+        """Newest-first lines spoken by `nick`."""
+        key = irc_lower(nick)
+        results: List[Line] = []
+        for seq in reversed(self._by_nick.get(key, ())):
+            results.append(self._line(seq))
+            if len(results) >= limit:
+                return results
+        if self.spill is not None:
+            results.extend(self.spill.search(set(), key, limit - len(results)))
+        return results
+
+
+class Scrollback:
+    """Per-channel scrollback fed from the client's PRIVMSG stream."""
+
+    def __init__(
+        self,
+        capacity: int = 500,
+        max_line: int = 400,
+        spill_dir: Optional[str] = None,
+        segment_bytes: int = 1 << 20,
+        max_segments: int = 4,
+    ) -> None:
+        self.capacity = capacity
+        self.max_line = max_line
+        self.spill_dir = spill_dir
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self._channels: Dict[str, ChannelScrollback] = {}
+
+    def channel(self, name: str, create: bool = False) -> Optional[ChannelScrollback]:
+        key = irc_lower(name)
+        buf = self._channels.get(key)
+        if buf is None and create:
+            spill = None
+            if self.spill_dir:
+                spill = SegmentSpill(self.spill_dir, name, self.segment_bytes, self.max_segments)
+            buf = self._channels[key] = ChannelScrollback(self.capacity, self.max_line, spill)
+        return buf
+
+    def handle_message(self, msg: Dict[str, Any]) -> None:
+        if msg["command"] != "PRIVMSG":
+            return
+        params = msg.get("params") or []
+        target = params[0] if params else ""
+        if not target.startswith(("#", "&")):
+            return
+        prefix = msg.get("prefix") or ""
+        nick = prefix.split("!", 1)[0]
+        text = msg.get("trailing") or ""
+        if text.startswith("\x01ACTION ") and text.endswith("\x01"):
+            text = f"* {nick} {text[8:-1]}"
+        self.channel(target, create=True).append(nick, text)
+
+    def search(self, channel: str, pattern: str, limit: int = 3) -> List[Line]:
+        buf = self.channel(channel)
+        return buf.search(pattern, limit) if buf else []
+
+    def last(self, channel: str, nick: str, limit: int = 3) -> List[Line]:
+        buf = self.channel(channel)
+        return buf.last(nick, limit) if buf else []
+
+    def close(self) -> None:
+        for buf in self._channels.values():
+            if buf.spill is not None:
+                buf.spill.close()
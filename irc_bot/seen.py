@@ -0,0 +1,303 @@
+import json
+import os
+import time
+import asyncio
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .irc_client import irc_lower
+from .journal import append_lines
+
+# Activity kinds, stored as small ints on each record
+KIND_PRIVMSG = 0
+KIND_JOIN = 1
+KIND_PART = 2
+KIND_QUIT = 3
+KIND_NICK_TO = 4
+KIND_NICK_FROM = 5
+
+KIND_NAMES = ("message", "join", "part", "quit", "nick", "nick")
+
+NO_CHANNEL = -1
+
+
+class SeenRecord:
+    """Last activity of one nick. Channels are stored as interned IDs."""
+
+    __slots__ = ("nick", "ts", "channel", "kind", "text")
+
+    def __init__(self, nick: str, ts: int, channel: int, kind: int, text: str) -> None:
+        self.nick = nick
+        self.ts = ts
+        self.channel = channel
+        self.kind = kind
+        self.text = text
+
+
+class SeenTracker:
+    """Tracks the last activity of every nick seen on the client's event stream.
+
+    Updates only touch memory. Changed records are appended to a journal
+    (`<path>.log`) in batches by `flush()`, and the journal is folded into the
+    snapshot at `path` once it grows larger than the number of tracked nicks.
+
+    Saved state is read by `load()`, which a bot runs in a worker thread, and
+    merged in by `install()` under whatever was recorded meanwhile; reading a
+    nick before that loads it inline. `flush_loop` writes the compacted
+    snapshot from a worker thread too.
+    """
+
+    def __init__(self, path: str = "seen.json", flush_interval: float = 60.0, max_text: int = 160) -> None:
+        self.path = Path(path)
+        self.journal_path = Path(str(self.path) + ".log")
+        self.flush_interval = flush_interval
+        self.max_text = max_text
+        self._records: Dict[str, SeenRecord] = {}
+        self._channels: List[str] = []
+        self._channel_ids: Dict[str, int] = {}
+        self._dirty: set = set()
+        self._journal_entries = 0
+        self._loaded = False
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._records)
+
+    # Event stream
+    def handle_message(self, msg: Dict[str, Any]) -> None:
+        cmd = msg["command"]
+        if cmd not in ("PRIVMSG", "JOIN", "PART", "QUIT", "NICK"):
+            return
+        prefix = msg.get("prefix") or ""
+        nick = prefix.split("!", 1)[0]
+        if not nick:
+            return
+        params = msg.get("params") or []
+        trailing = msg.get("trailing") or ""
+
+        if cmd == "PRIVMSG":
+            target = params[0] if params else ""
+            if not target.startswith(("#", "&")):
+                return  # private messages are not reported
+            if trailing.startswith("\x01ACTION ") and trailing.endswith("\x01"):
+                trailing = f"* {nick} {trailing[8:-1]}"
+            self.record(KIND_PRIVMSG, nick, target, trailing)
+        elif cmd == "JOIN":
+            self.record(KIND_JOIN, nick, params[0] if params else trailing, "")
+        elif cmd == "PART":
+            self.record(KIND_PART, nick, params[0] if params else "", trailing)
+        elif cmd == "QUIT":
+            self.record(KIND_QUIT, nick, None, trailing)
+        else:
+            new_nick = params[0] if params else trailing
+            if not new_nick:
+                return
+            self.record(KIND_NICK_TO, nick, None, new_nick)
+            self.record(KIND_NICK_FROM, new_nick, None, nick)
+
+    def record(self, kind: int, nick: str, channel: Optional[str], text: str, ts: Optional[int] = None) -> None:
+        key = irc_lower(nick)
+        if ts is None:
+            ts = int(time.time())
+        chan_id = self._channel_id(channel) if channel else NO_CHANNEL
+        if len(text) > self.max_text:
+            text = text[: self.max_text]
+        rec = self._records.get(key)
+        if rec is None:
+            # Share the key object when the nick is already lower-case
+            self._records[key] = SeenRecord(key if key == nick else nick, ts, chan_id, kind, text)
+        else:
+            if rec.nick != nick:
+                rec.nick = nick
+            rec.ts = ts
+            rec.channel = chan_id
+            rec.kind = kind
+            rec.text = text
+        self._dirty.add(key)
+
+    def last_seen(self, nick: str) -> Optional[Dict[str, Any]]:
+        self._ensure_loaded()
+        rec = self._records.get(irc_lower(nick))
+        if rec is None:
+            return None
+        return {
+            "nick": rec.nick,
+            "ts": rec.ts,
+            "channel": self._channels[rec.channel] if rec.channel != NO_CHANNEL else None,
+            "kind": rec.kind,
+            "text": rec.text,
+        }
+
+    def _channel_id(self, channel: str) -> int:
+        key = irc_lower(channel)
+        cid = self._channel_ids.get(key)
+        if cid is None:
+            cid = len(self._channels)
+            self._channels.append(channel)
+            self._channel_ids[key] = cid
+        return cid
+
+    # Persistence
+    def load(self) -> "SeenTracker":
+        """Read the saved snapshot and journal into a new tracker, for `install()`.
+
+        Touches nothing of this tracker, so it can run off the event loop.
+        """
+        loaded = SeenTracker(str(self.path), self.flush_interval, self.max_text)
+        loaded._read_saved()
+        return loaded
+
+    def install(self, loaded: "SeenTracker") -> None:
+        """Take over the saved state in `loaded`; records made since startup are newer and win."""
+        if self._loaded:
+            return
+        live, live_channels = self._records, self._channels
+        self._records, self._channels, self._channel_ids = loaded._records, loaded._channels, loaded._channel_ids
+        self._journal_entries += loaded._journal_entries
+        for key, rec in live.items():
+            if rec.channel != NO_CHANNEL:
+                rec.channel = self._channel_id(live_channels[rec.channel])
+            self._records[key] = rec
+        self._loaded = True
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.install(self.load())
+
+    def _read_saved(self) -> None:
+        if self.path.exists():
+            try:
+                with self.path.open("r", encoding="utf-8") as f:
+                    self._read_snapshot(f)
+            except Exception:
+                self._records = {}
+        if self.journal_path.exists():
+            with self.journal_path.open("r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    try:
+                        nick, ts, channel, kind, text = json.loads(line)
+                    except Exception:
+                        continue  # torn write at the tail of the journal
+                    self.record(kind, nick, channel, text, ts=ts)
+                    self._journal_entries += 1
+        self._dirty.clear()
+
+    def _read_snapshot(self, f) -> None:
+        # Version 2: a header line, one [key, nick, ts, channel id, kind, text]
+        # line per nick, then the channel list. Parsing line by line keeps any
+        # single step short, so a loading thread does not stall the event loop.
+        # Version 1 is one JSON object holding both.
+        header = json.loads(f.readline() or "{}")
+        if header.get("version", 1) == 1:
+            channels = header.get("channels", [])
+            nicks = ([key] + value for key, value in header.get("nicks", {}).items())
+        else:
+            channels = []
+            nicks = (json.loads(line) for line in f)
+        records = self._records
+        for entry in nicks:
+            if type(entry) is dict:
+                channels = entry["channels"]
+                continue
+            key, nick, ts, cid, kind, text = entry
+            records[key] = SeenRecord(key if key == nick else nick, ts, cid, kind, text)
+        ids = [self._channel_id(ch) for ch in channels]
+        if ids != list(range(len(ids))):
+            for rec in records.values():
+                if rec.channel != NO_CHANNEL:
+                    rec.channel = ids[rec.channel]
+
+    def flush(self) -> int:
+        """Write pending updates to the journal. Returns the number of records written."""
+        if not self._dirty:
+            return 0
+        dirty, self._dirty = self._dirty, set()
+        lines = []
+        for key in dirty:
+            rec = self._records[key]
+            channel = self._channels[rec.channel] if rec.channel != NO_CHANNEL else None
+            lines.append(json.dumps([rec.nick, rec.ts, channel, rec.kind, rec.text], ensure_ascii=False))
+        append_lines(self.journal_path, lines)
+        self._journal_entries += len(lines)
+        return len(lines)
+
+    def compaction_due(self) -> bool:
+        # Never before the saved state is in: the snapshot would lose it
+        return self._loaded and self._journal_entries > max(1000, len(self._records))
+
+    def compact(self) -> None:
+        """Fold the journal into a fresh snapshot."""
+        tmp, offset, keys, records = self._start_compaction()
+        self._write_snapshot(tmp, keys, records)
+        self._finish_compaction(tmp, offset)
+
+    async def compact_in_background(self) -> None:
+        """Like `compact()`, with the snapshot serialized and written by a worker thread."""
+        tmp, offset, keys, records = self._start_compaction()
+        await asyncio.get_running_loop().run_in_executor(None, self._write_snapshot, tmp, keys, records)
+        self._finish_compaction(tmp, offset)
+
+    def _start_compaction(self):
+        self._ensure_loaded()
+        # Everything changed so far goes into the journal first; the snapshot
+        # then replaces exactly the journal up to `offset`
+        self.flush()
+        try:
+            offset = self.journal_path.stat().st_size
+        except FileNotFoundError:
+            offset = 0
+        # Separate key and record lists: a list of 300k fresh (key, record)
+        # tuples would set off garbage collections costing far more
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        return tmp, offset, list(self._records), list(self._records.values())
+
+    def _write_snapshot(self, tmp: Path, keys: List[str], records: List[SeenRecord]) -> None:
+        # May run on a worker thread while records keep changing. A record
+        # changed meanwhile is dirty and reaches the journal after `offset`,
+        # so a torn copy of it here is overridden on load. Channels are only
+        # ever appended, so reading the list last covers every id seen above.
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+        with tmp.open("w", encoding="utf-8") as f:
+            f.write('{"version":2}\n')
+            for start in range(0, len(keys), 1000):
+                rows = zip(keys[start:start + 1000], records[start:start + 1000])
+                f.write("".join(encode([key, r.nick, r.ts, r.channel, r.kind, r.text]) + "\n" for key, r in rows))
+            f.write(encode({"channels": list(self._channels)}) + "\n")
+
+    def _finish_compaction(self, tmp: Path, offset: int) -> None:
+        try:
+            with self.journal_path.open("rb") as f:
+                f.seek(offset)
+                tail = f.read()
+        except FileNotFoundError:
+            tail = b""
+        os.replace(tmp, self.path)
+        # Keep what was journaled while the snapshot was being written
+        journal_tmp = self.journal_path.with_name(self.journal_path.name + ".tmp")
+        journal_tmp.write_bytes(tail)
+        os.replace(journal_tmp, self.journal_path)
+        self._journal_entries = tail.count(b"\n")
+
+    async def flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+            if self.compaction_due():
+                await self.compact_in_background()
+
+
+def format_ago(seconds: int) -> str:
+    seconds = max(0, int(seconds))
+    days, rem = divmod(seconds, 86400)
+    hours, rem = divmod(rem, 3600)
+    minutes, secs = divmod(rem, 60)
+    parts = []
+    if days:
+        parts.append(f"{days}d")
+    if hours:
+        parts.append(f"{hours}h")
+    if minutes and not days:
+        parts.append(f"{minutes}m")
+    if not parts:
+        parts.append(f"{secs}s")
+    return " ".join(parts)
@@ -0,0 +1,14 @@
+"""Test doubles shared by the client and command tests."""
+
+
+class FakeWriter:
+    """Stands in for an asyncio StreamWriter and records each line sent."""
+
+    def __init__(self):
+        self.lines = []
+
+    def write(self, data):
+        self.lines.append(data.decode("utf-8").rstrip("\r\n"))
+
+    async def drain(self):
+        pass
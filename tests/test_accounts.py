@@ -0,0 +1,120 @@
+import asyncio
+import os
+import unittest
+from pathlib import Path
+
+from irc_bot.bot import Bot
+from irc_bot.irc_client import IRCClient, UserIndex, parse_irc_message
+from irc_bot.profiles import ProfileStore
+
+from fakes import FakeWriter
+
+
+class TestAccounts(unittest.TestCase):
+    def setUp(self):
+        self.users = UserIndex("bot")
+
+    def feed(self, line):
+        self.users.handle_message(parse_irc_message(line))
+
+    def test_extended_join_and_account_notify(self):
+        self.feed(":Alice!u@h JOIN #chan alice_acct :Alice Real\r\n")
+        self.assertEqual(self.users.account("alice"), "alice_acct")
+        self.feed(":Alice!u@h ACCOUNT *\r\n")
+        self.assertIsNone(self.users.account("alice"))
+        self.feed(":Alice!u@h ACCOUNT :other\r\n")
+        self.assertEqual(self.users.account("ALICE"), "other")
+
+    def test_nick_change_and_quit(self):
+        self.feed(":alice!u@h JOIN #chan acct :Real\r\n")
+        self.feed(":alice!u@h NICK :alice_away\r\n")
+        self.assertIsNone(self.users.account("alice"))
+        self.assertEqual(self.users.account("alice_away"), "acct")
+        self.feed(":alice_away!u@h QUIT :bye\r\n")
+        self.assertIsNone(self.users.get("alice_away"))
+
+    def test_forgotten_when_no_shared_channel(self):
+        self.feed(":server 353 bot = #a :@alice bob\r\n")
+        self.feed(":alice!u@h JOIN #b acct :Real\r\n")
+        self.feed(":alice!u@h PART #a\r\n")
+        self.assertEqual(self.users.account("alice"), "acct")
+        self.feed(":op!u@h KICK #b alice :bye\r\n")
+        self.assertIsNone(self.users.get("alice"))
+        # The bot leaving a channel forgets everyone only seen there
+        self.feed(":bot!u@h PART #a\r\n")
+        self.assertIsNone(self.users.get("bob"))
+
+    def test_account_tag(self):
+        self.users.account_tag = True
+        self.feed("@account=acct :alice!u@h PRIVMSG bot :hi\r\n")
+        self.assertEqual(self.users.account("alice"), "acct")
+        self.feed(":alice!u@h PRIVMSG bot :logged out now\r\n")
+        self.assertIsNone(self.users.account("alice"))
+
+    def test_account_tag_does_not_cache_strangers(self):
+        self.users.account_tag = True
+        self.feed("@account=acct :alice!u@h PRIVMSG bot :hi\r\n")
+        self.assertIsNone(self.users.get("alice"))
+        self.feed("@account=other :bob!u@h PRIVMSG bot :hi\r\n")
+        self.assertIsNone(self.users.account("alice"))
+        self.assertEqual(self.users.account("bob"), "other")
+        self.assertEqual(len(self.users), 0)
+
+
+class TestCapNegotiation(unittest.TestCase):
+    def test_requests_offered_account_caps(self):
+        client = IRCClient(server="example", port=6667, tls=False, nickname="bot", username="bot", realname="bot")
+        client.writer = FakeWriter()
+
+        async def run():
+            await client._handle_cap(parse_irc_message(":srv CAP * LS * :multi-prefix account-notify\r\n"))
+            self.assertEqual(client.writer.lines, [])
+            await client._handle_cap(parse_irc_message(":srv CAP * LS :account-tag sasl=PLAIN\r\n"))
+            self.assertEqual(client.writer.lines, ["CAP REQ :account-notify account-tag"])
+            await client._handle_cap(parse_irc_message(":srv CAP * ACK :account-notify account-tag\r\n"))
+
+        asyncio.run(run())
+        self.assertEqual(client.writer.lines[-1], "CAP END")
+        self.assertTrue(client.users.account_tag)
+
+
+class TestProfileMigration(unittest.TestCase):
+    def setUp(self):
+        self.path = Path(".tmp_migration_test.json")
+        cfg = {"server": "x", "port": 6667, "tls": False, "nickname": "bot", "username": "bot", "realname": "bot",
+               "channels": []}
+        self.bot = Bot(cfg, profile_store=ProfileStore(path=str(self.path)))
+        self.bot.client.writer = FakeWriter()
+        self.store = self.bot.profiles
+        self.store.update_profile("alice", {"location": "NY"})
+
+    def tearDown(self):
+        for p in (self.path, Path(f"{self.path}.lock")):
+            try:
+                os.remove(p)
+            except Exception:
+                pass
+
+    def command(self, nick, account, text):
+        async def run():
+            self.bot.client.users.handle_message(parse_irc_message(f":{nick}!u@h JOIN #c {account} :x\r\n"))
+            self.bot.on_privmsg(nick, "#c", text)
+            await asyncio.sleep(0.01)
+
+        asyncio.run(run())
+        return self.bot.client.writer.lines[-1]
+
+    def test_matching_account_migrates(self):
+        self.command("alice", "Alice", "!profile get")
+        self.assertEqual(self.store.get_profile("$a:alice"), {"location": "NY"})
+        self.assertIsNone(self.store.get_profile("alice"))
+
+    def test_other_account_must_claim(self):
+        self.assertIn("No profile found", self.command("alice", "mallory", "!profile get"))
+        self.assertEqual(self.store.get_profile("alice"), {"location": "NY"})
+        self.assertIn("moved to your account", self.command("alice", "mallory", "!profile claim"))
+        self.assertEqual(self.store.get_profile("$a:mallory"), {"location": "NY"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import asyncio
+import unittest
+
+from irc_bot.bot import Bot
+from irc_bot.commands.say import chunk_text, pack_targets
+from irc_bot.irc_client import parse_irc_message
+from irc_bot.profiles import ProfileStore
+
+from fakes import FakeWriter
+
+
+CFG = {
+    "server": "example",
+    "port": 6667,
+    "tls": False,
+    "nickname": "bot",
+    "username": "bot",
+    "realname": "bot",
+    "channels": [],
+    "admins": ["boss"],
+    "say_groups": {"all": ["#a", "#b", "#c", "#d", "#e", "#gone"]},
+    "flood_burst": 100,
+    "flood_interval": 0.01,
+}
+
+
+class TestPacking(unittest.TestCase):
+    def test_chunk_text(self):
+        self.assertEqual(chunk_text("aa bb cc", 5), ["aa bb", "cc"])
+        self.assertEqual(chunk_text("abcdefgh x", 3), ["abc", "def", "gh", "x"])
+        for chunk in chunk_text("é" * 10, 5):
+            self.assertLessEqual(len(chunk.encode("utf-8")), 5)
+
+    def test_pack_targets(self):
+        chans = ["#a", "#bb", "#ccc", "#d"]
+        self.assertEqual(pack_targets(chans, 2, 100), [["#a", "#bb"], ["#ccc", "#d"]])
+        self.assertEqual(pack_targets(chans, None, 8), [["#a", "#bb"], ["#ccc", "#d"]])
+        self.assertEqual(pack_targets(chans, 1, 100), [[c] for c in chans])
+
+
+class TestBroadcast(unittest.TestCase):
+    def setUp(self):
+        self.bot = Bot(dict(CFG), profile_store=ProfileStore(path=".tmp_broadcast_unused.json"))
+        self.bot.broadcast_error_grace = 0
+        self.client = self.bot.client
+        self.client.writer = FakeWriter()
+        for ch in ["#a", "#b", "#c", "#d", "#e"]:
+            self.client.users.handle_message(parse_irc_message(f":bot!bot@host JOIN {ch}\r\n"))
+
+    def test_max_targets(self):
+        self.assertEqual(self.client.max_targets(), 1)
+        self.client.isupport["TARGMAX"] = "NAMES:1,PRIVMSG:4,NOTICE:"
+        self.assertEqual(self.client.max_targets("PRIVMSG"), 4)
+        self.assertIsNone(self.client.max_targets("NOTICE"))
+        self.assertEqual(self.client.max_targets("TAGMSG"), 1)
+
+    def test_group_broadcast_batches_targets(self):
+        self.client.isupport["TARGMAX"] = "PRIVMSG:4"
+
+        async def run():
+            self.bot.on_privmsg("boss", "bot", "!say -to @all hello everyone")
+            await asyncio.sleep(0.2)
+            await self.client.close()
+
+        asyncio.run(run())
+        lines = self.client.writer.lines
+        self.assertEqual(lines[0], "PRIVMSG #a,#b,#c,#d :hello everyone")
+        self.assertEqual(lines[1], "PRIVMSG #e :hello everyone")
+        self.assertTrue(lines[2].startswith("PRIVMSG boss :"))
+        self.assertIn("Broadcast sent to 5 channel(s) in 2 line(s).", lines[2])
+        self.assertIn("#gone (not joined)", lines[2])
+
+    def test_replies_go_to_sender(self):
+        async def run():
+            self.bot.on_privmsg("alice", "bot", "!say -to @nope hi")
+            await asyncio.sleep(0.05)
+            await self.client.close()
+
+        asyncio.run(run())
+        self.assertTrue(self.client.writer.lines[0].startswith("PRIVMSG alice :Unknown group '@nope'"))
+
+    def test_plain_say_keeps_leading_channel_word(self):
+        self.bot.cfg["say_channel"] = "#a"
+
+        async def run():
+            self.bot.on_privmsg("boss", "bot", "!say #b is open")
+            await asyncio.sleep(0.05)
+            await self.client.close()
+
+        asyncio.run(run())
+        self.assertEqual(self.client.writer.lines, ["PRIVMSG #a :#b is open"])
+
+    def test_op_check_waits_for_pending_sync(self):
+        self.client.isupport["WHOX"] = ""
+
+        async def run():
+            self.client.queue_sync("#a")
+            await asyncio.sleep(0)
+            self.bot.on_privmsg("alice", "bot", "!say -to #a news")
+            await asyncio.sleep(0.01)
+            self.assertEqual(self.client.writer.lines, ["WHO #a %tcuhnfa,1"])
+            self.client._update_from_whox(parse_irc_message(":srv 354 bot 1 #a u h alice H@ 0\r\n"))
+            self.client._who_done(parse_irc_message(":srv 315 bot #a :End of /WHO list.\r\n"))
+            await asyncio.sleep(0.05)
+            await self.client.close()
+
+        asyncio.run(run())
+        self.assertIn("PRIVMSG #a :news", self.client.writer.lines)
+
+    def test_permissions_and_send_errors(self):
+        self.client.isupport["TARGMAX"] = "PRIVMSG:10"
+        self.client._update_modes(parse_irc_message(":srv MODE #a +o alice\r\n"))
+        self.client._update_modes(parse_irc_message(":srv MODE #b +o alice\r\n"))
+        self.bot.broadcast_error_grace = 0.05
+
+        async def run():
+            self.bot.on_privmsg("alice", "bot", "!say -to #a,#b,#c news")
+            await asyncio.sleep(0.01)
+            self.bot.on_message(parse_irc_message(":srv 404 bot #B :Cannot send to channel\r\n"))
+            await asyncio.sleep(0.2)
+            await self.client.close()
+
+        asyncio.run(run())
+        lines = self.client.writer.lines
+        self.assertEqual(lines[0], "PRIVMSG #a,#b :news")
+        self.assertTrue(lines[1].startswith("PRIVMSG alice :"))
+        self.assertIn("sent to 1 channel(s)", lines[1])
+        self.assertIn("Failed: #b (Cannot send to channel)", lines[1])
+        self.assertIn("Skipped: #c (not op)", lines[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import unittest
+
+from irc_bot.irc_client import IRCClient, parse_irc_message
+
+from fakes import FakeWriter
+
+
+class TestChannelSync(unittest.TestCase):
+    def setUp(self):
+        self.client = IRCClient(
+            server="example", port=6667, tls=False, nickname="bot", username="bot", realname="bot", who_interval=0
+        )
+        self.client.writer = FakeWriter()
+
+    def test_isupport(self):
+        self.client._update_isupport(parse_irc_message(":srv 005 bot WHOX TARGMAX=PRIVMSG:4 :are supported\r\n"))
+        self.assertEqual(self.client.isupport, {"WHOX": "", "TARGMAX": "PRIVMSG:4"})
+
+    def test_whox_sync(self):
+        client = self.client
+        client.isupport["WHOX"] = ""
+
+        async def run():
+            client.queue_sync("#chan")
+            client.queue_sync("#other")
+            await asyncio.sleep(0)
+            # Only one query is in flight at a time
+            self.assertEqual(client.writer.lines, ["WHO #chan %tcuhnfa,1"])
+            self.assertFalse(client.is_synced("#chan"))
+            client._update_from_whox(parse_irc_message(":srv 354 bot 1 #chan ali host.example alice G@ alice_acct\r\n"))
+            client._update_from_whox(parse_irc_message(":srv 354 bot 1 #chan bob host.example bob H 0\r\n"))
+            # Replies to someone else's WHOX query are ignored
+            client._update_from_whox(parse_irc_message(":srv 354 bot 99 #chan eve host eve H@ eve\r\n"))
+            client._who_done(parse_irc_message(":srv 315 bot #chan :End of /WHO list.\r\n"))
+            self.assertTrue(await client.wait_synced("#CHAN", timeout=1))
+            await asyncio.sleep(0.01)
+            self.assertEqual(client.writer.lines[-1], "WHO #other %tcuhnfa,2")
+            await client.close()
+
+        asyncio.run(run())
+        alice = client.users.get("alice")
+        self.assertEqual(alice.account, "alice_acct")
+        self.assertEqual((alice.user, alice.host), ("ali", "host.example"))
+        self.assertTrue(alice.away)
+        self.assertTrue(client.is_op_or_above("#chan", "alice"))
+        self.assertIsNone(client.users.account("bob"))
+        self.assertFalse(client.users.get("bob").away)
+        self.assertIsNone(client.users.get("eve"))
+
+    def test_plain_who_fallback(self):
+        client = self.client
+
+        async def run():
+            client.queue_sync("#chan")
+            await asyncio.sleep(0)
+            self.assertEqual(client.writer.lines, ["WHO #chan"])
+            client._update_from_who(parse_irc_message(":srv 352 bot #chan ali host srv alice H% :0 Alice\r\n"))
+            client._who_done(parse_irc_message(":srv 315 bot #chan :End of /WHO list.\r\n"))
+            self.assertTrue(await client.wait_synced("#chan", timeout=1))
+            await client.close()
+
+        asyncio.run(run())
+        self.assertEqual(client.users.get("alice").host, "host")
+        self.assertIn("h", client.users.roles("alice", "#chan"))
+
+    def test_who_replaces_stale_roles(self):
+        client = self.client
+        client.users.handle_message(parse_irc_message(":srv 353 bot = #chan :@alice +bob\r\n"))
+        self.assertTrue(client.is_op_or_above("#chan", "alice"))
+        client._update_from_who(parse_irc_message(":srv 352 bot #chan ali host srv alice H :0 Alice\r\n"))
+        self.assertFalse(client.is_op_or_above("#chan", "alice"))
+        self.assertEqual(client.users.roles("alice", "#chan"), set())
+
+    def test_own_nick_change(self):
+        client = self.client
+
+        async def run():
+            client.reader = asyncio.StreamReader()
+            client.reader.feed_data(b":bot!bot@host JOIN #chan\r\n:bot!bot@host NICK bot2\r\n")
+            client.reader.feed_eof()
+            await client.run()
+            await client.close()
+
+        asyncio.run(run())
+        self.assertEqual(client.nickname, "bot2")
+        self.assertTrue(client.in_channel("#chan"))
+
+
+if __name__ == "__main__":
+    unittest.main()
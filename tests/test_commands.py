@@ -0,0 +1,78 @@
+import asyncio
+import sys
+import unittest
+from unittest import mock
+
+from irc_bot.bot import Bot
+from irc_bot.commands import MANIFEST, CommandRegistry
+from irc_bot.profiles import ProfileStore
+
+from fakes import FakeWriter
+
+
+class TestCommandRegistry(unittest.TestCase):
+    def test_manifest_entries_resolve(self):
+        registry = CommandRegistry()
+        for name in MANIFEST:
+            self.assertTrue(callable(registry.get(name)), name)
+
+    def test_modules_are_imported_on_first_use(self):
+        sys.modules.pop("colorsys", None)
+        registry = CommandRegistry({"hsv": "colorsys:rgb_to_hsv"})
+        self.assertIn("hsv", registry)
+        self.assertNotIn("colorsys", sys.modules)
+        handler = registry.get("hsv")
+        self.assertIn("colorsys", sys.modules)
+        self.assertIs(registry.get("hsv"), handler)
+
+    def test_register_and_names(self):
+        registry = CommandRegistry({"ping": "irc_bot.commands.basic:cmd_ping"})
+        registry.register("echo", lambda bot, target, nick, args: None)
+        self.assertEqual(registry.names(), ["echo", "ping"])
+        self.assertIsNone(registry.get("missing"))
+
+    def test_broken_handler_replies_unavailable(self):
+        cfg = {"server": "x", "port": 6667, "tls": False, "nickname": "bot", "username": "bot", "realname": "bot",
+               "channels": []}
+        bot = Bot(cfg, profile_store=ProfileStore(path=".tmp_registry_unused.json"))
+        bot.client.writer = FakeWriter()
+        bot.commands = CommandRegistry({"gone": "irc_bot.commands.no_such_module:cmd_gone",
+                                        "typo": "irc_bot.commands.basic:cmd_no_such_command"})
+
+        async def run():
+            bot.on_privmsg("alice", "#chan", "!gone")
+            bot.on_privmsg("alice", "bot", "!typo")
+            await asyncio.sleep(0.01)
+
+        with mock.patch("builtins.print") as out:
+            asyncio.run(run())
+        self.assertEqual(bot.client.writer.lines, [
+            "PRIVMSG #chan :Command 'gone' is unavailable.",
+            "PRIVMSG alice :Command 'typo' is unavailable.",
+        ])
+        self.assertTrue(any("ModuleNotFoundError" in str(c) for c in out.call_args_list))
+        self.assertTrue(any("AttributeError" in str(c) for c in out.call_args_list))
+
+
+class TestProfileWarmup(unittest.TestCase):
+    def test_failure_is_reported_once(self):
+        cfg = {"server": "x", "port": 6667, "tls": False, "nickname": "bot", "username": "bot", "realname": "bot",
+               "channels": []}
+        bot = Bot(cfg, profile_store=ProfileStore(path=".tmp_warmup_unused.json"))
+        bot.profiles.reload = mock.Mock(side_effect=PermissionError("denied"))
+
+        async def run():
+            bot.on_welcome()
+            await asyncio.sleep(0.05)
+            bot.on_welcome()
+            await asyncio.sleep(0.05)
+            bot._seen_task.cancel()
+
+        with mock.patch("builtins.print") as out:
+            asyncio.run(run())
+        self.assertEqual(bot.profiles.reload.call_count, 1)
+        self.assertTrue(any("Could not load profiles" in str(c) for c in out.call_args_list))
+
+
+if __name__ == "__main__":
+    unittest.main()
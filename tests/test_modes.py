@@ -11,7 +11,7 @@ class TestModes(unittest.TestCase):
 
     def test_353_parsing_ops(self):
         msg = parse_irc_message(":server 353 me = #chan :@alice +bob charlie\r\n")
-        self.client._update_names_from_353(msg)
+        self.client.users.handle_message(msg)
         self.assertTrue(self.client.is_op_or_above("#chan", "alice"))
         self.assertFalse(self.client.is_op_or_above("#chan", "bob"))
         self.assertFalse(self.client.is_op_or_above("#chan", "charlie"))
@@ -26,6 +26,44 @@ class TestModes(unittest.TestCase):
         self.client._update_modes(msg2)
         self.assertFalse(self.client.is_op_or_above("#chan", "alice"))
 
+    def test_mode_arguments_of_other_modes_are_skipped(self):
+        self.client.isupport["CHANMODES"] = "beI,k,l,imnpst"
+        msg = parse_irc_message(":nick MODE #chan +kbo key *!*@host alice\r\n")
+        self.client._update_modes(msg)
+        self.assertTrue(self.client.is_op_or_above("#chan", "alice"))
+        self.assertFalse(self.client.is_op_or_above("#chan", "key"))
+        self.client._update_modes(parse_irc_message(":nick MODE #chan -lo alice\r\n"))
+        self.assertFalse(self.client.is_op_or_above("#chan", "alice"))
+
+    def test_roles_follow_the_member(self):
+        feed = self.client.users.handle_message
+        feed(parse_irc_message(":server 353 bot = #chan :@alice bob carol\r\n"))
+        self.client._update_modes(parse_irc_message(":alice!u@h MODE #chan +o carol\r\n"))
+        self.assertTrue(self.client.is_op_or_above("#CHAN", "ALICE"))
+
+        # Whoever takes a nick afterwards does not inherit its op
+        feed(parse_irc_message(":alice!u@h NICK alice_\r\n"))
+        feed(parse_irc_message(":mallory!u@h JOIN #chan\r\n"))
+        feed(parse_irc_message(":mallory!u@h NICK alice\r\n"))
+        self.assertFalse(self.client.is_op_or_above("#chan", "alice"))
+        self.assertTrue(self.client.is_op_or_above("#chan", "alice_"))
+
+        feed(parse_irc_message(":alice_!u@h PART #chan\r\n"))
+        feed(parse_irc_message(":alice_!u@h JOIN #chan\r\n"))
+        self.assertFalse(self.client.is_op_or_above("#chan", "alice_"))
+        feed(parse_irc_message(":op!u@h KICK #chan carol :bye\r\n"))
+        feed(parse_irc_message(":carol!u@h JOIN #chan\r\n"))
+        self.assertFalse(self.client.is_op_or_above("#chan", "carol"))
+
+        self.client._update_modes(parse_irc_message(":x MODE #chan +o bob\r\n"))
+        feed(parse_irc_message(":bob!u@h QUIT :gone\r\n"))
+        feed(parse_irc_message(":bob!u@h JOIN #chan\r\n"))
+        self.assertFalse(self.client.is_op_or_above("#chan", "bob"))
+
+        self.client._update_modes(parse_irc_message(":x MODE #chan +o bob\r\n"))
+        feed(parse_irc_message(":bot!u@h PART #chan\r\n"))
+        self.assertFalse(self.client.is_op_or_above("#chan", "bob"))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import unittest
+from unittest import mock
+from pathlib import Path
+
+from irc_bot.bot import Bot, shard_networks
+from irc_bot.config import load_networks
+from irc_bot.irc_client import parse_irc_message
+from irc_bot.profiles import ProfileStore, main as profiles_main
+
+from fakes import FakeWriter
+
+
+BASE = {
+    "port": 6697,
+    "tls": True,
+    "nickname": "bot",
+    "username": "bot",
+    "realname": "bot",
+    "channels": ["#a"],
+}
+
+
+class TestNetworks(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(".tmp_networks_test.json")
+
+    def tearDown(self):
+        for p in (self.tmp, Path(f"{self.tmp}.profiles"), Path(f"{self.tmp}.profiles.lock")):
+            try:
+                os.remove(p)
+            except Exception:
+                pass
+
+    def write(self, data):
+        self.tmp.write_text(json.dumps(data), encoding="utf-8")
+
+    def test_single_network_config(self):
+        self.write(dict(BASE, server="irc.example"))
+        cfgs = load_networks(str(self.tmp))
+        self.assertEqual(len(cfgs), 1)
+        self.assertIsNone(cfgs[0].get("name"))
+        self.assertEqual(cfgs[0]["seen_path"], "seen.json")
+
+    def test_networks_inherit_shared_keys(self):
+        self.write(dict(BASE, scrollback_spill_dir="logs", networks=[
+            {"name": "libera", "server": "irc.libera.chat"},
+            {"server": "irc.oftc.net", "nickname": "bot2", "channels": ["#b"]},
+        ]))
+        libera, oftc = load_networks(str(self.tmp))
+        self.assertEqual(libera["nickname"], "bot")
+        self.assertEqual(libera["seen_path"], "seen-libera.json")
+        self.assertEqual(Path(libera["scrollback_spill_dir"]), Path("logs/libera"))
+        self.assertEqual(oftc["name"], "irc.oftc.net")
+        self.assertEqual(oftc["nickname"], "bot2")
+        self.assertEqual(oftc["channels"], ["#b"])
+
+    def test_duplicate_names_rejected(self):
+        self.write(dict(BASE, networks=[{"server": "irc.example"}, {"server": "irc.example"}]))
+        with self.assertRaises(ValueError):
+            load_networks(str(self.tmp))
+
+    def test_bots_share_profile_store(self):
+        self.write(dict(BASE, networks=[{"name": "a", "server": "x"}, {"name": "b", "server": "y"}]))
+        store = ProfileStore(path=str(self.tmp) + ".profiles")
+        bots = [Bot(cfg, profile_store=store) for cfg in load_networks(str(self.tmp))]
+        self.assertIs(bots[0].profiles, bots[1].profiles)
+        self.assertNotEqual(bots[0]._account_key("alice"), bots[1]._account_key("alice"))
+
+    def test_nick_profiles_are_per_network(self):
+        self.write(dict(BASE, networks=[{"name": "a", "server": "x"}, {"name": "b", "server": "y"}]))
+        store = ProfileStore(path=f"{self.tmp}.profiles")
+        a, b = [Bot(cfg, profile_store=store) for cfg in load_networks(str(self.tmp))]
+        for bot in (a, b):
+            bot.client.writer = FakeWriter()
+
+        async def run():
+            a.on_privmsg("alice", "bot", "!profile set location=NY")
+            # An identified "alice" on b must not pick up a's nick profile
+            b.client.users.handle_message(parse_irc_message(":alice!u@h JOIN #a alice :Alice\r\n"))
+            b.on_privmsg("alice", "bot", "!profile get")
+            await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+        self.assertEqual(store.get_profile(a._nick_key("alice")), {"location": "NY"})
+        self.assertIsNone(store.get_profile(b._nick_key("alice")))
+        self.assertIsNone(store.get_profile(b._account_key("alice")))
+        self.assertIn("No profile found", b.client.writer.lines[-1])
+
+    def test_legacy_profiles_move_under_network_name(self):
+        self.write(dict(BASE, networks=[
+            {"name": "a", "server": "x", "legacy_profiles": True},
+            {"name": "b", "server": "y"},
+        ]))
+        store = ProfileStore(path=f"{self.tmp}.profiles")
+        store.update_profile("alice", {"location": "NY"})
+        store.update_profile("$a:bob", {"location": "LA"})
+        a, b = [Bot(cfg, profile_store=store) for cfg in load_networks(str(self.tmp))]
+        for bot in (a, b):
+            bot.client.writer = FakeWriter()
+
+        async def run():
+            a.on_privmsg("carol", "#a", "!view alice")
+            b.on_privmsg("alice", "bot", "!profile get")
+            a.client.users.handle_message(parse_irc_message(":bob!u@h JOIN #a bob :Bob\r\n"))
+            a.on_privmsg("alice", "bot", "!profile get")
+            a.on_privmsg("bob", "bot", "!profile get")
+            await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+        self.assertIn("Profile for alice: location=NY", a.client.writer.lines[0])
+        self.assertIn("No profile found", b.client.writer.lines[0])
+        self.assertEqual(store.get_profile("$n:a:alice"), {"location": "NY"})
+        self.assertEqual(store.get_profile("$a:a:bob"), {"location": "LA"})
+        self.assertIsNone(store.get_profile("alice"))
+        self.assertIsNone(store.get_profile("$a:bob"))
+
+    def test_import_profiles_under_network(self):
+        old = Path(f"{self.tmp}.old")
+        old.write_text(json.dumps({"Alice": {"age": 30}, "$a:bob": {"bio": "hi"}, "$n:z:eve": {"age": 1}}))
+        dst = f"{self.tmp}.profiles"
+        ProfileStore(dst).update_profile("$n:libera:alice", {"age": 40})
+        try:
+            with open(os.devnull, "w") as devnull, mock.patch("sys.stdout", devnull):
+                self.assertEqual(profiles_main([str(old), dst, "--network", "libera"]), 0)
+                # The network was renamed: re-key its profiles in place
+                self.assertEqual(profiles_main([dst, dst, "--network", "oftc", "--from-network", "libera"]), 0)
+        finally:
+            old.unlink()
+        store = ProfileStore(dst)
+        self.assertEqual(store.get_profile("$n:oftc:alice"), {"age": 40})
+        self.assertEqual(store.get_profile("$a:oftc:bob"), {"bio": "hi"})
+        self.assertIsNone(store.get_profile("$a:libera:bob"))
+        self.assertIsNone(store.get_profile("$n:libera:eve"))
+
+    def test_shard_networks(self):
+        cfgs = [{"name": str(i)} for i in range(5)]
+        shards = shard_networks(cfgs, 2)
+        self.assertEqual([[c["name"] for c in s] for s in shards], [["0", "2", "4"], ["1", "3"]])
+        self.assertEqual(len(shard_networks(cfgs[:1], 4)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
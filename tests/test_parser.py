@@ -25,6 +25,14 @@ class TestParser(unittest.TestCase):
         self.assertEqual(msg["params"], ["nick"])
         self.assertEqual(msg["trailing"], "Welcome")
 
+    def test_tags(self):
+        line = "@account=alice;msgid=a\\sb\\:c :alice!u@h PRIVMSG #chan :hi\r\n"
+        msg = parse_irc_message(line)
+        self.assertEqual(msg["tags"], {"account": "alice", "msgid": "a b;c"})
+        self.assertEqual(msg["prefix"], "alice!u@h")
+        self.assertEqual(msg["command"], "PRIVMSG")
+        self.assertEqual(msg["trailing"], "hi")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import unittest
+from pathlib import Path
+
+from irc_bot.profiles import ProfileFileError, ProfileStore
+
+TMP = Path(".tmp_profile_locking_test.json")
+WORKERS = 4
+UPDATES = 25
+SHARED_FIELDS = ["age", "gender", "location", "bio"]
+
+
+def _writer(worker: int) -> None:
+    store = ProfileStore(path=str(TMP))
+    for i in range(UPDATES):
+        store.update_profile(f"w{worker}_{i}", {"bio": f"from {worker}"})
+    # Every worker also sets its own field on one shared record
+    store.update_profile("shared", {SHARED_FIELDS[worker]: str(worker)})
+
+
+class TestProfileLocking(unittest.TestCase):
+    def setUp(self):
+        self._cleanup()
+
+    def tearDown(self):
+        self._cleanup()
+
+    def _cleanup(self):
+        for p in (TMP, Path(str(TMP) + ".lock")):
+            try:
+                os.remove(p)
+            except Exception:
+                pass
+
+    def test_concurrent_writers_lose_no_updates(self):
+        ctx = multiprocessing.get_context("spawn")
+        procs = [ctx.Process(target=_writer, args=(w,)) for w in range(WORKERS)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(60)
+            self.assertEqual(p.exitcode, 0)
+
+        store = ProfileStore(path=str(TMP))
+        for w in range(WORKERS):
+            for i in range(UPDATES):
+                self.assertEqual(store.get_profile(f"w{w}_{i}"), {"bio": f"from {w}"})
+        shared = store.get_profile("shared")
+        self.assertEqual(set(shared), set(SHARED_FIELDS))
+
+    def test_outside_changes_are_picked_up(self):
+        reader = ProfileStore(path=str(TMP), check_interval=0)
+        self.assertIsNone(reader.get_profile("alice"))
+        writer = ProfileStore(path=str(TMP))
+        writer.update_profile("alice", {"location": "NY"})
+        self.assertEqual(reader.get_profile("alice")["location"], "NY")
+        # Writes merge into the latest file contents instead of a stale copy
+        reader.update_profile("bob", {"location": "LA"})
+        writer.update_profile("alice", {"bio": "hi"})
+        final = ProfileStore(path=str(TMP))
+        self.assertEqual(final.get_profile("bob")["location"], "LA")
+        self.assertEqual(final.get_profile("alice"), {"location": "NY", "bio": "hi"})
+
+    def test_unreadable_file_is_not_overwritten(self):
+        running = ProfileStore(path=str(TMP), check_interval=0)
+        running.update_profile("alice", {"location": "NY"})
+        broken = TMP.read_text(encoding="utf-8").rstrip().rstrip("}") + ', "bob": {"age": 30},}'
+        TMP.write_text(broken, encoding="utf-8")
+
+        for store in (running, ProfileStore(path=str(TMP))):
+            with self.assertRaises(ProfileFileError):
+                store.update_profile("dave", {"bio": "hi"})
+            self.assertEqual(TMP.read_text(encoding="utf-8"), broken)
+        with self.assertRaises(ProfileFileError):
+            running.reload()
+        # Reads keep answering from the last good copy
+        self.assertEqual(running.get_profile("alice"), {"location": "NY"})
+
+        TMP.write_text(broken[:-2] + "}", encoding="utf-8")
+        running.update_profile("dave", {"bio": "hi"})
+        self.assertEqual(running.get_profile("bob"), {"age": 30})
+
+    def test_reads_are_throttled(self):
+        reader = ProfileStore(path=str(TMP), check_interval=3600)
+        self.assertIsNone(reader.get_profile("alice"))
+        ProfileStore(path=str(TMP)).update_profile("alice", {"location": "NY"})
+        self.assertIsNone(reader.get_profile("alice"))
+        reader.reload()
+        self.assertEqual(reader.get_profile("alice")["location"], "NY")
+
+
+if __name__ == "__main__":
+    unittest.main()
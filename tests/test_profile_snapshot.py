@@ -0,0 +1,177 @@
+import json
+import os
+import tempfile
+import unittest
+import unittest.mock
+from pathlib import Path
+
+from irc_bot import profile_snapshot
+from irc_bot.profile_snapshot import MAGIC, SnapshotReader, main, write_snapshot
+from irc_bot.profiles import ProfileRecord, ProfileStore
+
+
+class TestProfileRecord(unittest.TestCase):
+    def test_round_trip_keeps_unknown_keys(self):
+        rec = ProfileRecord.from_dict({"age": 30, "location": "NY", "interests": "gaming"})
+        self.assertEqual(rec.to_dict(), {"age": 30, "location": "NY", "interests": "gaming"})
+        self.assertIsNone(rec.bio)
+
+    def test_common_values_are_shared(self):
+        a = ProfileRecord.from_dict({"location": "".join(["N", "Y"])})
+        b = ProfileRecord.from_dict({"location": "".join(["N", "Y"])})
+        self.assertIs(a.location, b.location)
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.dir.name, "profiles.bin")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_write_and_lookup(self):
+        records = {
+            f"nick{i}": ProfileRecord.from_dict({"age": i, "gender": "f", "bio": f"hi {i} ✓"}) for i in range(50)
+        }
+        records["$a:net:ålice"] = ProfileRecord.from_dict({"age": "old", "seeking": "chat", "x": [1, 2]})
+        write_snapshot(self.path, records)
+
+        reader = SnapshotReader(self.path)
+        self.assertEqual(len(reader), 51)
+        self.assertEqual(reader.get("nick7").to_dict(), {"age": 7, "gender": "f", "bio": "hi 7 ✓"})
+        self.assertEqual(reader.get("$a:net:ålice").to_dict(), {"age": "old", "seeking": "chat", "x": [1, 2]})
+        self.assertIsNone(reader.get("nick50"))
+        self.assertIsNone(reader.get(""))
+        self.assertEqual(sorted(reader.keys()), sorted(records))
+        reader.close()
+
+    def test_rejects_other_versions(self):
+        write_snapshot(self.path, {})
+        raw = bytearray(self.path.read_bytes())
+        raw[8] = 99
+        self.path.write_bytes(bytes(raw))
+        with self.assertRaises(ValueError):
+            SnapshotReader(self.path)
+
+    def test_binary_store(self):
+        store = ProfileStore(str(self.path), fmt="binary")
+        store.update_profile("alice", {"age": "28", "location": "NY"})
+        store.update_profile("bob", {"gender": "m"})
+        self.assertEqual(self.path.read_bytes()[:8], MAGIC)
+
+        other = ProfileStore(str(self.path), fmt="binary")
+        self.assertEqual(other.get_profile("alice"), {"age": 28, "location": "NY"})
+        self.assertEqual(len(other), 2)
+        self.assertTrue(other.migrate("bob", "$a:bob"))
+        other.clear_profile("alice")
+        store.reload()
+        self.assertIsNone(store.get_profile("alice"))
+        self.assertEqual(store.get_profile("$a:bob"), {"gender": "m"})
+        store.close()
+        other.close()
+
+    def test_lookups_see_old_data_while_reloading(self):
+        store = ProfileStore(str(self.path), fmt="binary")
+        store.update_profile("alice", {"age": "28"})
+        other = ProfileStore(str(self.path), fmt="binary")
+        other.update_profile("alice", {"age": "29"})
+        seen = []
+        real = SnapshotReader.__init__
+
+        def slow_open(reader, path):
+            # Another thread asking while the new snapshot is being opened
+            seen.append(store.get_profile("alice"))
+            real(reader, path)
+
+        with unittest.mock.patch.object(SnapshotReader, "__init__", slow_open):
+            store.reload()
+        self.assertEqual(seen, [{"age": 28}])
+        self.assertEqual(store.get_profile("alice"), {"age": 29})
+        store.close()
+        other.close()
+
+    def test_edits_are_journaled_then_compacted(self):
+        store = ProfileStore(str(self.path), fmt="binary")
+        store.update_profile("alice", {"age": "28"})
+        store.update_profile("bob", {"gender": "m"})
+        snapshot = self.path.read_bytes()
+
+        store.update_profile("alice", {"location": "NY"})
+        store.clear_profile("bob")
+        store.update_profile("carol", {"bio": "hi"})
+        self.assertEqual(self.path.read_bytes(), snapshot)
+        self.assertTrue(store.delta_path.exists())
+        self.assertEqual(len(store), 2)
+
+        other = ProfileStore(str(self.path), fmt="binary")
+        self.assertEqual(other.get_profile("alice"), {"age": 28, "location": "NY"})
+        self.assertIsNone(other.get_profile("bob"))
+        self.assertEqual(len(other), 2)
+
+        self.assertTrue(store.compact())
+        self.assertFalse(store.delta_path.exists())
+        self.assertEqual(sorted(SnapshotReader(self.path).keys()), ["alice", "carol"])
+        other.reload()
+        self.assertEqual(other.get_profile("carol"), {"bio": "hi"})
+        self.assertFalse(other.compact())
+        store.close()
+        other.close()
+
+    def test_edit_after_torn_journal_line(self):
+        store = ProfileStore(str(self.path), fmt="binary")
+        store.update_profile("alice", {"age": "28"})
+        store.update_profile("bob", {"age": "30"})
+        # A writer that crashed partway through an append
+        with open(store.delta_path, "ab") as fh:
+            fh.write(b'{"k": "carol", "p": {"bio": "h')
+        store.update_profile("dave", {"bio": "hi"})
+
+        fresh = ProfileStore(str(self.path), fmt="binary")
+        self.assertEqual(fresh.get_profile("dave"), {"bio": "hi"})
+        self.assertEqual(fresh.get_profile("bob"), {"age": 30})
+        self.assertIsNone(fresh.get_profile("carol"))
+        store.close()
+        fresh.close()
+
+    def test_compaction_keeps_edits_made_meanwhile(self):
+        store = ProfileStore(str(self.path), fmt="binary")
+        store.update_profile("alice", {"age": "28"})
+        store.update_profile("alice", {"age": "29"})
+        other = ProfileStore(str(self.path), fmt="binary")
+        merge = profile_snapshot.merge_snapshot
+
+        def slow_merge(*args):
+            merge(*args)
+            other.update_profile("bob", {"gender": "m"})
+
+        with unittest.mock.patch.object(profile_snapshot, "merge_snapshot", slow_merge):
+            self.assertTrue(store.compact())
+        self.assertEqual(len(SnapshotReader(self.path)), 1)
+        self.assertEqual(store.get_profile("alice"), {"age": 29})
+        self.assertEqual(store.get_profile("bob"), {"gender": "m"})
+        store.close()
+        other.close()
+
+    def test_compacts_in_background(self):
+        store = ProfileStore(str(self.path), fmt="binary")
+        store.compact_after = 1
+        store.update_profile("alice", {"age": "28"})
+        store.update_profile("alice", {"age": "29"})
+        store.close()
+        self.assertFalse(store.delta_path.exists())
+        self.assertEqual(ProfileStore(str(self.path)).get_profile("alice"), {"age": 29})
+
+    def test_convert_json_to_snapshot_and_back(self):
+        src = Path(self.dir.name, "profiles.json")
+        src.write_text(json.dumps({"alice": {"age": 28, "bio": "hi"}}), encoding="utf-8")
+        with open(os.devnull, "w") as devnull, unittest.mock.patch("sys.stdout", devnull):
+            self.assertEqual(main([str(src), str(self.path)]), 0)
+            back = Path(self.dir.name, "back.json")
+            self.assertEqual(main([str(self.path), str(back)]), 0)
+        self.assertEqual(ProfileStore(str(self.path)).get_profile("alice"), {"age": 28, "bio": "hi"})
+        self.assertEqual(json.loads(back.read_text(encoding="utf-8")), {"alice": {"age": 28, "bio": "hi"}})
+
+
+if __name__ == "__main__":
+    unittest.main()
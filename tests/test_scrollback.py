@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+import shutil
+from pathlib import Path
+
+from irc_bot.bot import Bot
+from irc_bot.irc_client import parse_irc_message
+from irc_bot.profiles import ProfileStore
+from irc_bot.scrollback import ChannelScrollback, Scrollback
+
+from fakes import FakeWriter
+
+
+class TestScrollback(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(".tmp_scrollback_test")
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_search_newest_first(self):
+        buf = ChannelScrollback(capacity=10)
+        buf.append("alice", "the build is broken", ts=1)
+        buf.append("bob", "unrelated chatter", ts=2)
+        buf.append("carol", "Build fixed now", ts=3)
+        self.assertEqual([l[1] for l in buf.search("build")], ["carol", "alice"])
+        self.assertEqual([l[1] for l in buf.search("build broken")], ["alice"])
+        self.assertEqual(buf.search("missing"), [])
+
+    def test_eviction_updates_index(self):
+        buf = ChannelScrollback(capacity=3)
+        buf.append("alice", "first needle", ts=1)
+        for i in range(3):
+            buf.append("bob", f"filler {i}", ts=2 + i)
+        self.assertEqual(len(buf), 3)
+        self.assertEqual(buf.search("needle"), [])
+        self.assertEqual(buf.last("alice"), [])
+        self.assertNotIn("needle", buf._tokens)
+        self.assertEqual([l[2] for l in buf.last("BOB", limit=2)], ["filler 2", "filler 1"])
+
+    def test_spill_is_searched(self):
+        sb = Scrollback(capacity=2, spill_dir=str(self.tmp), segment_bytes=64, max_segments=2)
+        for i in range(8):
+            sb.handle_message(parse_irc_message(f":n{i}!u@h PRIVMSG #chan :line number {i}\r\n"))
+        sb.handle_message(parse_irc_message(":x!u@h PRIVMSG bot :private\r\n"))
+        # Two lines in memory, older ones spilled; rotation keeps at most two segments
+        self.assertLessEqual(len(list(self.tmp.iterdir())), 2)
+        self.assertEqual([l[2] for l in sb.search("#CHAN", "number", limit=3)],
+                         ["line number 7", "line number 6", "line number 5"])
+        self.assertEqual([l[2] for l in sb.last("#chan", "n5")], ["line number 5"])
+        self.assertEqual(sb.last("#chan", "n0"), [])
+        sb.close()
+
+
+class TestScrollbackCommands(unittest.TestCase):
+    def test_dm_results_go_to_sender(self):
+        cfg = {"server": "x", "port": 6667, "tls": False, "nickname": "bot", "username": "bot", "realname": "bot",
+               "channels": [], "admins": ["boss"]}
+        bot = Bot(cfg, profile_store=ProfileStore(path=".tmp_scrollback_unused.json"))
+        bot.client.writer = FakeWriter()
+        bot.on_message(parse_irc_message(":alice!u@h PRIVMSG #chan :deploy done\r\n"))
+
+        async def run():
+            bot.on_privmsg("boss", "bot", "!grep #chan deploy")
+            bot.on_privmsg("boss", "bot", "!last #chan nobody")
+            bot.on_privmsg("boss", "bot", "!seen alice")
+            await asyncio.sleep(0.01)
+
+        asyncio.run(run())
+        lines = bot.client.writer.lines
+        self.assertRegex(lines[0], r"^PRIVMSG boss :\[#chan .*\] <alice> deploy done$")
+        self.assertEqual(lines[1], "PRIVMSG boss :No recent lines from nobody in #chan.")
+        self.assertTrue(lines[2].startswith("PRIVMSG boss :alice was last seen"))
+
+    def test_seen_hides_channels_the_asker_is_not_in(self):
+        cfg = {"server": "x", "port": 6667, "tls": False, "nickname": "bot", "username": "bot", "realname": "bot",
+               "channels": []}
+        bot = Bot(cfg, profile_store=ProfileStore(path=".tmp_scrollback_unused.json"))
+        bot.client.writer = FakeWriter()
+        for line in (":bot!u@h JOIN #secret\r\n", ":bot!u@h JOIN #lobby\r\n", ":carol!u@h JOIN #Secret\r\n",
+                     ":alice!u@h PRIVMSG #secret :the plan\r\n"):
+            bot.client.users.handle_message(parse_irc_message(line))
+            bot.on_message(parse_irc_message(line))
+
+        async def run():
+            bot.on_privmsg("mallory", "bot", "!seen alice")
+            bot.on_privmsg("mallory", "#lobby", "!seen alice")
+            bot.on_privmsg("carol", "bot", "!seen alice")
+            bot.on_privmsg("dave", "#SECRET", "!seen alice")
+            await asyncio.sleep(0.01)
+
+        asyncio.run(run())
+        lines = [line for line in bot.client.writer.lines if line.startswith("PRIVMSG")]
+        self.assertRegex(lines[0], r"^PRIVMSG mallory :alice was last seen \S+ ago\.$")
+        self.assertRegex(lines[1], r"^PRIVMSG #lobby :alice was last seen \S+ ago\.$")
+        self.assertTrue(lines[2].endswith("ago in #secret, saying: the plan"))
+        self.assertTrue(lines[3].endswith("ago in #secret, saying: the plan"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import unittest
+import os
+from pathlib import Path
+
+from irc_bot.irc_client import parse_irc_message
+from irc_bot.seen import SeenTracker, KIND_PRIVMSG, KIND_QUIT, KIND_NICK_TO, KIND_NICK_FROM
+
+
+class TestSeen(unittest.TestCase):
+    def setUp(self):
+        self.tmp = Path(".tmp_seen_test.json")
+        self._cleanup()
+
+    def tearDown(self):
+        self._cleanup()
+
+    def _cleanup(self):
+        for suffix in ("", ".log", ".tmp", ".log.tmp"):
+            p = Path(str(self.tmp) + suffix)
+            try:
+                os.remove(p)
+            except Exception:
+                pass
+
+    def feed(self, tracker, line):
+        tracker.handle_message(parse_irc_message(line))
+
+    def test_privmsg_and_casemapped_lookup(self):
+        tracker = SeenTracker(path=str(self.tmp))
+        self.feed(tracker, ":Alice[m]!u@h PRIVMSG #chan :hello there\r\n")
+        info = tracker.last_seen("alice{M}")
+        self.assertIsNotNone(info)
+        self.assertEqual(info["nick"], "Alice[m]")
+        self.assertEqual(info["channel"], "#chan")
+        self.assertEqual(info["kind"], KIND_PRIVMSG)
+        self.assertEqual(info["text"], "hello there")
+
+    def test_private_messages_ignored(self):
+        tracker = SeenTracker(path=str(self.tmp))
+        self.feed(tracker, ":alice!u@h PRIVMSG bot :secret\r\n")
+        self.assertIsNone(tracker.last_seen("alice"))
+
+    def test_nick_change_and_quit(self):
+        tracker = SeenTracker(path=str(self.tmp))
+        self.feed(tracker, ":alice!u@h NICK :alice_\r\n")
+        self.assertEqual(tracker.last_seen("alice")["kind"], KIND_NICK_TO)
+        self.assertEqual(tracker.last_seen("alice")["text"], "alice_")
+        self.assertEqual(tracker.last_seen("alice_")["kind"], KIND_NICK_FROM)
+        self.feed(tracker, ":alice_!u@h QUIT :bye\r\n")
+        info = tracker.last_seen("alice_")
+        self.assertEqual(info["kind"], KIND_QUIT)
+        self.assertIsNone(info["channel"])
+
+    def test_flush_and_reload(self):
+        tracker = SeenTracker(path=str(self.tmp))
+        self.feed(tracker, ":alice!u@h JOIN #chan\r\n")
+        self.feed(tracker, ":bob!u@h PRIVMSG #other :hi\r\n")
+        self.feed(tracker, ":alice!u@h PRIVMSG #chan :one\r\n")
+        self.feed(tracker, ":alice!u@h PRIVMSG #chan :two\r\n")
+        # Repeated updates to one nick coalesce into a single journal entry
+        self.assertEqual(tracker.flush(), 2)
+        self.assertEqual(tracker.flush(), 0)
+
+        reloaded = SeenTracker(path=str(self.tmp))
+        self.assertEqual(reloaded.last_seen("alice")["text"], "two")
+        self.assertEqual(reloaded.last_seen("bob")["channel"], "#other")
+
+        reloaded.compact()
+        again = SeenTracker(path=str(self.tmp))
+        self.assertEqual(len(again), 2)
+        self.assertEqual(again.last_seen("alice")["channel"], "#chan")
+
+    def test_flush_after_torn_journal_line(self):
+        tracker = SeenTracker(path=str(self.tmp))
+        self.feed(tracker, ":alice!u@h PRIVMSG #chan :one\r\n")
+        tracker.flush()
+        with open(str(self.tmp) + ".log", "ab") as fh:
+            fh.write('["carol", 1, "#chan", 0, "caf\u00e9'.encode("utf-8")[:-1])
+        self.feed(tracker, ":dave!u@h PRIVMSG #chan :two\r\n")
+        tracker.flush()
+
+        reloaded = SeenTracker(path=str(self.tmp))
+        self.assertEqual(reloaded.last_seen("dave")["text"], "two")
+        self.assertEqual(reloaded.last_seen("alice")["text"], "one")
+        self.assertIsNone(reloaded.last_seen("carol"))
+
+    def test_reads_version_1_snapshot(self):
+        self.tmp.write_text(json.dumps({
+            "version": 1,
+            "channels": ["#a", "#b"],
+            "nicks": {"alice": ["Alice", 5, 1, KIND_PRIVMSG, "hi"], "bob": ["bob", 6, -1, KIND_QUIT, "bye"]},
+        }), encoding="utf-8")
+        tracker = SeenTracker(path=str(self.tmp))
+        self.assertEqual(tracker.last_seen("ALICE")["channel"], "#b")
+        self.assertIsNone(tracker.last_seen("bob")["channel"])
+        tracker.compact()
+        self.assertEqual(SeenTracker(path=str(self.tmp)).last_seen("alice")["nick"], "Alice")
+
+    def test_records_before_load_win_over_saved_state(self):
+        saved = SeenTracker(path=str(self.tmp))
+        self.feed(saved, ":alice!u@h PRIVMSG #old :saved\r\n")
+        self.feed(saved, ":bob!u@h PRIVMSG #old :saved\r\n")
+        saved.flush()
+
+        tracker = SeenTracker(path=str(self.tmp))
+        self.feed(tracker, ":alice!u@h PRIVMSG #new :live\r\n")
+        # Recording does not read the saved state on the event loop
+        self.assertFalse(tracker._loaded)
+        tracker.install(tracker.load())
+        self.assertEqual(tracker.last_seen("alice")["channel"], "#new")
+        self.assertEqual(tracker.last_seen("alice")["text"], "live")
+        self.assertEqual(tracker.last_seen("bob")["channel"], "#old")
+        self.assertEqual(tracker.flush(), 1)
+
+    def test_background_compaction_keeps_later_updates(self):
+        tracker = SeenTracker(path=str(self.tmp))
+        self.feed(tracker, ":alice!u@h PRIVMSG #chan :one\r\n")
+        write = tracker._write_snapshot
+
+        def slow_write(tmp, keys, records):
+            # Messages keep arriving while the snapshot is written
+            self.feed(tracker, ":bob!u@h PRIVMSG #other :two\r\n")
+            self.feed(tracker, ":alice!u@h PRIVMSG #other :three\r\n")
+            tracker.flush()
+            write(tmp, keys, records)
+
+        tracker._write_snapshot = slow_write
+        asyncio.run(tracker.compact_in_background())
+        self.assertEqual(tracker._journal_entries, 2)
+
+        reloaded = SeenTracker(path=str(self.tmp))
+        self.assertEqual(reloaded.last_seen("alice")["text"], "three")
+        self.assertEqual(reloaded.last_seen("bob")["channel"], "#other")
+        self.assertEqual(len(reloaded), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
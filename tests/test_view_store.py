@@ -14,10 +14,11 @@ class TestViewStore(unittest.TestCase):
             pass
 
     def tearDown(self):
-        try:
-            os.remove(self.tmp)
-        except Exception:
-            pass
+        for p in (self.tmp, Path(str(self.tmp) + ".lock")):
+            try:
+                os.remove(p)
+            except Exception:
+                pass
 
     def test_store_and_retrieve_other(self):
         store = ProfileStore(path=str(self.tmp))
@@ -28,6 +29,18 @@ class TestViewStore(unittest.TestCase):
         self.assertEqual(prof["location"], "NY")
         self.assertEqual(prof["bio"], "Hello")
 
+    def test_migrate_nick_profile_to_account(self):
+        store = ProfileStore(path=str(self.tmp))
+        store.update_profile("alice", {"location": "NY"})
+        key = ProfileStore.account_key("Alice")
+        self.assertTrue(store.migrate("alice", key))
+        self.assertIsNone(store.get_profile("alice"))
+        self.assertEqual(ProfileStore(path=str(self.tmp)).get_profile(key)["location"], "NY")
+        # An existing account profile is never overwritten
+        store.update_profile("alice", {"location": "LA"})
+        self.assertFalse(store.migrate("alice", key))
+        self.assertEqual(store.get_profile(key)["location"], "NY")
+
 
 if __name__ == "__main__":
     unittest.main()